@@ -0,0 +1,197 @@
+import sys
+
+import numpy as np
+
+from quiz_data import QUIZ
+from quiz_logic import build_result_table, score_vectors
+
+# Questions every run answers before the confidence stop may end it, however sure the prior is.
+MIN_QUESTIONS = 4
+# Floor for option probabilities, so an answer never seen for a result can't rule it out entirely.
+MIN_PROBABILITY = 1e-6
+
+
+def full_score_vectors(quiz=QUIZ) -> np.ndarray:
+    """Every counters vector of a complete run, as rows of an M × K matrix."""
+    return np.array(
+        [counts for counts in score_vectors(quiz.total_questions, len(quiz.score_types))
+         if sum(counts) == quiz.total_questions],
+        dtype=np.int64,
+    )
+
+
+def count_sheets(option_types, type_count: int, skip: int = None) -> np.ndarray:
+    """Counts the answer sheets leading to each counters vector, as a dense (T+1)^K array.
+
+    `skip` leaves one question out. Only practical for a handful of score types.
+    """
+    total = len(option_types)
+    ways = np.zeros((total + 1,) * type_count)
+    ways[(0,) * type_count] = 1
+    for q_num, types in enumerate(option_types):
+        if q_num == skip:
+            continue
+        stepped = np.zeros_like(ways)
+        for type_index in types:
+            target = [slice(None)] * type_count
+            source = [slice(None)] * type_count
+            target[type_index], source[type_index] = slice(1, None), slice(None, -1)
+            stepped[tuple(target)] += ways[tuple(source)]
+        ways = stepped
+    return ways
+
+
+class AdaptiveEngine:
+    """Picks questions in the order that narrows down the final result fastest, and stops early.
+
+    The model is naive Bayes over the quiz's distinct results (title and text; 18 for this
+    quiz): a prior per result and, per question and option, the probability of that
+    answer among users who end with that result. After every answer the posterior over
+    results is updated; the next question is the unasked one with the lowest expected
+    posterior entropy, computed for all of them at once with a few array operations.
+    Once one result reaches `threshold` probability, and at least `min_questions` are
+    answered, the quiz ends with that result.
+
+    `answers` arguments are per-question bytes: 0 for not asked yet, otherwise option + 1.
+    """
+
+    def __init__(self, likelihood: np.ndarray, prior: np.ndarray, outcomes: list, threshold: float = 0.95,
+                 min_questions: int = MIN_QUESTIONS):
+        self.likelihood = np.maximum(likelihood, MIN_PROBABILITY)
+        self.log_likelihood = np.log(self.likelihood)
+        self.log_prior = np.log(np.maximum(prior, MIN_PROBABILITY))
+        self.outcomes = outcomes
+        self.threshold = threshold
+        self.min_questions = max(1, min_questions)
+
+    @staticmethod
+    def classes(quiz=QUIZ):
+        """Returns (vectors, class of each vector, one representative vector per class as bytes)."""
+        vectors = full_score_vectors(quiz)
+        result_table = build_result_table(quiz)
+        class_of_result, outcomes, class_of_vector = {}, [], []
+        for counts in vectors:
+            key = bytes(counts.astype(np.uint8))
+            result = result_table[key]
+            if result not in class_of_result:
+                class_of_result[result] = len(outcomes)
+                outcomes.append(key)
+            class_of_vector.append(class_of_result[result])
+        return vectors, np.array(class_of_vector), outcomes
+
+    @classmethod
+    def from_uniform_answers(cls, quiz=QUIZ, threshold: float = 0.95,
+                             min_questions: int = MIN_QUESTIONS) -> "AdaptiveEngine":
+        """Builds the model exactly, assuming every option of every question is equally likely.
+
+        Every question here offers each type once, so this model finds them all equally
+        informative and asks them in file order: a baseline for evaluate(), not for the bot.
+        """
+        vectors, class_of_vector, outcomes = cls.classes(quiz)
+        type_count = len(quiz.score_types)
+        widest = max(len(types) for types in quiz.option_types)
+        counts = np.zeros((quiz.total_questions, widest, len(outcomes)))
+        for q_num, types in enumerate(quiz.option_types):
+            ways = count_sheets(quiz.option_types, type_count, skip=q_num)
+            for o_num, type_index in enumerate(types):
+                previous = vectors.copy()
+                previous[:, type_index] -= 1
+                valid = previous[:, type_index] >= 0
+                np.add.at(counts[q_num, o_num], class_of_vector[valid], ways[tuple(previous[valid].T)])
+        prior = counts[0].sum(axis=0)
+        return cls(counts / prior, prior / prior.sum(), outcomes, threshold, min_questions)
+
+    @classmethod
+    def from_answer_sheets(cls, sheets: np.ndarray, quiz=QUIZ, threshold: float = 0.95,
+                           smoothing: float = 1.0, min_questions: int = MIN_QUESTIONS) -> "AdaptiveEngine":
+        """Fits the model to complete answer sheets (N × T option indices), with additive smoothing."""
+        from batch_scoring import scores_from_answers
+
+        vectors, class_of_vector, outcomes = cls.classes(quiz)
+        index_of_vector = {bytes(vector.astype(np.uint8)): position for position, vector in enumerate(vectors)}
+        scores = scores_from_answers(sheets).astype(np.uint8)
+        sheet_classes = np.array([class_of_vector[index_of_vector[bytes(row)]] for row in scores], dtype=np.int64)
+
+        widest = max(len(types) for types in quiz.option_types)
+        counts = np.full((quiz.total_questions, widest, len(outcomes)), smoothing)
+        for q_num, types in enumerate(quiz.option_types):
+            counts[q_num, len(types):] = 0
+            np.add.at(counts[q_num], (sheets[:, q_num], sheet_classes), 1)
+        prior = np.bincount(sheet_classes, minlength=len(outcomes)) + smoothing
+        return cls(counts / counts.sum(axis=1, keepdims=True), prior / prior.sum(), outcomes, threshold,
+                   min_questions)
+
+    @classmethod
+    def load(cls, path: str, threshold: float = 0.95, min_questions: int = MIN_QUESTIONS) -> "AdaptiveEngine":
+        with np.load(path) as data:
+            return cls(data['likelihood'], data['prior'], [bytes(row) for row in data['outcomes']], threshold,
+                       min_questions)
+
+    def save(self, path: str) -> None:
+        np.savez(path, likelihood=self.likelihood, prior=np.exp(self.log_prior),
+                 outcomes=np.array([list(outcome) for outcome in self.outcomes], dtype=np.uint8))
+
+    def posterior(self, answers) -> np.ndarray:
+        picked = np.frombuffer(bytes(answers), dtype=np.uint8)
+        asked = np.flatnonzero(picked)
+        log_posterior = self.log_prior + self.log_likelihood[asked, picked[asked] - 1].sum(axis=0)
+        posterior = np.exp(log_posterior - log_posterior.max())
+        return posterior / posterior.sum()
+
+    def next_question(self, answers):
+        """Returns the question to ask next, or None once the result is confident or every question is answered."""
+        unasked = np.flatnonzero(np.frombuffer(bytes(answers), dtype=np.uint8) == 0)
+        if not len(unasked):
+            return None
+        posterior = self.posterior(answers)
+        if len(answers) - len(unasked) >= self.min_questions and posterior.max() >= self.threshold:
+            return None
+        joint = self.likelihood[unasked] * posterior
+        answer_probability = joint.sum(axis=2)
+        conditional = joint / answer_probability[:, :, None]
+        entropy = -(conditional * np.log(conditional)).sum(axis=2)
+        return int(unasked[(answer_probability * entropy).sum(axis=1).argmin()])
+
+    def outcome(self, answers, counts) -> bytes:
+        """The counters to read the result from: the run's own once complete, else the most likely result's."""
+        if all(answers):
+            return bytes(counts)
+        return self.outcomes[int(self.posterior(answers).argmax())]
+
+
+def evaluate(engine: AdaptiveEngine, sheets: np.ndarray, quiz=QUIZ):
+    """Runs complete answer sheets through the engine; returns (share classified as with all answers, mean questions)."""
+    result_table = build_result_table(quiz)
+    agree, asked_total = 0, 0
+    for sheet in sheets:
+        answers, counts = bytearray(quiz.total_questions), bytearray(len(quiz.score_types))
+        q_num = engine.next_question(answers)
+        while q_num is not None:
+            answers[q_num] = sheet[q_num] + 1
+            counts[quiz.option_types[q_num][sheet[q_num]]] += 1
+            q_num = engine.next_question(answers)
+        full = bytearray(len(quiz.score_types))
+        for q_num, o_num in enumerate(sheet):
+            full[quiz.option_types[q_num][o_num]] += 1
+        agree += result_table[engine.outcome(answers, counts)] == result_table[bytes(full)]
+        asked_total += sum(1 for answer in answers if answer)
+    return agree / len(sheets), asked_total / len(sheets)
+
+
+if __name__ == '__main__':
+    # python adaptive.py [answer_log_dir model.npz]: fit a model from logged answers, or
+    # without arguments check the uniform model against random answer sheets.
+    rng = np.random.default_rng(0)
+    widths = np.array([len(types) for types in QUIZ.option_types])
+    if len(sys.argv) == 3:
+        from batch_scoring import answer_sheets_from_log, map_answer_log
+
+        sheets = answer_sheets_from_log(map_answer_log(sys.argv[1]))
+        engine = AdaptiveEngine.from_answer_sheets(sheets)
+        engine.save(sys.argv[2])
+        print(f"fitted on {len(sheets)} complete answer sheets, saved to {sys.argv[2]}")
+    else:
+        sheets = (rng.random((2000, QUIZ.total_questions)) * widths).astype(np.int64)
+        engine = AdaptiveEngine.from_uniform_answers()
+    agreement, mean_questions = evaluate(engine, sheets[:2000])
+    print(f"same result as all {QUIZ.total_questions} answers: {agreement:.1%}, questions asked: {mean_questions:.2f}")
@@ -0,0 +1,96 @@
+import asyncio
+import glob
+import logging
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+# One answer: user id (int64), Unix time in seconds (uint32), question index and option
+# index (uint8 each), padded to 16 bytes so records stay aligned in a memory map.
+RECORD = struct.Struct('<qIBBxx')
+SEGMENT_PATTERN = 'answers.{:06d}.bin'
+
+
+def segment_paths(directory: str) -> list:
+    """Returns the log's segment files, oldest first."""
+    return sorted(glob.glob(os.path.join(directory, 'answers.[0-9]*.bin')))
+
+
+class AnswerLog:
+    """Append-only log of every accepted answer as fixed-width binary records.
+
+    append() packs a record into an in-memory buffer. Once buffer_bytes are collected, or
+    on flush(), the buffer is handed to a single writer thread and a new one is started,
+    so the event loop never waits for the disk and chunks land in order. Segments are
+    rotated before they would exceed max_bytes, always on a record boundary, and a restart
+    continues the newest one, dropping a partial record left by a crash.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, buffer_bytes: int = 64 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes - max_bytes % RECORD.size
+        self.buffer_bytes = buffer_bytes
+        os.makedirs(directory, exist_ok=True)
+        existing = segment_paths(directory)
+        self._segment = int(os.path.basename(existing[-1]).split('.')[1]) if existing else 0
+        self._file = None
+        self._buffer = bytearray()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='answer-log')
+        self.records = 0
+
+    def append(self, user_id: int, question: int, answer: int, now: float = None) -> None:
+        now = time.time() if now is None else now
+        self._buffer += RECORD.pack(user_id, int(now), question, answer)
+        self.records += 1
+        if len(self._buffer) >= self.buffer_bytes:
+            self._submit()
+
+    def _submit(self) -> asyncio.Future:
+        data, self._buffer = self._buffer, bytearray()
+        return asyncio.get_running_loop().run_in_executor(self._executor, self._write, data)
+
+    async def flush(self) -> None:
+        """Returns once everything appended so far is written."""
+        await self._submit()
+
+    async def close(self) -> None:
+        await self.flush()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close_file)
+        self._executor.shutdown()
+
+    def _write(self, data: bytes) -> None:
+        try:
+            self._write_segments(data)
+        except OSError:
+            logger.exception("Failed to write %d answer log records", len(data) // RECORD.size)
+
+    def _write_segments(self, data: bytes) -> None:
+        while data:
+            if self._file is None:
+                self._file = open(os.path.join(self.directory, SEGMENT_PATTERN.format(self._segment)), 'ab')
+                self._file.truncate(self._file.tell() - self._file.tell() % RECORD.size)
+                self._file.seek(0, os.SEEK_END)
+            room = self.max_bytes - self._file.tell()
+            if room <= 0:
+                self._close_file()
+                self._segment += 1
+                continue
+            self._file.write(data[:room])
+            data = data[room:]
+        if self._file is not None:
+            self._file.flush()
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+async def flush_answer_log(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback: writes out the AnswerLog in job.data."""
+    await context.job.data.flush()
@@ -0,0 +1,156 @@
+import itertools
+import os
+
+import numpy as np
+
+from answer_log import RECORD, segment_paths
+from quiz_data import QUIZ
+from scoring import SCORE_DECIMALS, WeightedScorer
+
+SCORE_TYPES = QUIZ.score_types
+TYPE_COUNT = len(SCORE_TYPES)
+RESULT_KEYS = np.array(SCORE_TYPES + ('MIXED', 'POLY', 'NEUTRAL'), dtype=object)
+MIXED, POLY, NEUTRAL = TYPE_COUNT, TYPE_COUNT + 1, TYPE_COUNT + 2
+MIXED_MAX_GAP = 2
+
+# The layout of answer_log.RECORD.
+ANSWER_LOG_DTYPE = np.dtype([
+    ('user_id', '<i8'), ('timestamp', '<u4'), ('question', 'u1'), ('answer', 'u1'), ('padding', 'V2'),
+])
+assert ANSWER_LOG_DTYPE.itemsize == RECORD.size
+
+
+def build_option_types(quiz=QUIZ) -> np.ndarray:
+    """Returns a (questions × options) matrix of score type indices, -1 where a question has fewer options."""
+    width = max(len(types) for types in quiz.option_types)
+    option_types = np.full((quiz.total_questions, width), -1, dtype=np.int8)
+    for q_num, types in enumerate(quiz.option_types):
+        option_types[q_num, :len(types)] = types
+    return option_types
+
+
+def build_title_tables(quiz=QUIZ):
+    """Returns (dominant_titles[K], mixed_titles[K, K], poly_title, neutral_title)."""
+    interpretations = quiz.interpretations
+    dominant_titles = np.array([interpretations[t]['title'] for t in quiz.score_types], dtype=object)
+    template = interpretations['MIXED']['title_template']
+    mixed_titles = np.empty((len(quiz.score_types),) * 2, dtype=object)
+    for i, j in itertools.product(range(len(quiz.score_types)), repeat=2):
+        mixed_titles[i, j] = template.format(
+            Dominant_Type=quiz.type_names[quiz.score_types[i]],
+            Secondary_Type=quiz.type_names[quiz.score_types[j]],
+        )
+    return dominant_titles, mixed_titles, interpretations['POLY']['title'], interpretations['NEUTRAL']['title']
+
+
+OPTION_TYPES = build_option_types()
+# With weighted options a sheet's scores are the sum of its rows of the compiled weight matrix.
+SCORER = WeightedScorer(QUIZ) if QUIZ.weighted else None
+DOMINANT_TITLES, MIXED_TITLES, POLY_TITLE, NEUTRAL_TITLE = build_title_tables()
+
+
+def scores_from_answers(answers: np.ndarray) -> np.ndarray:
+    """Turns an N × total_questions matrix of option indices (0 = first option) into N × K scores.
+
+    Scores are counts, or rounded weight sums when the quiz has weighted options.
+    """
+    answers = np.asarray(answers)
+    types = OPTION_TYPES[np.arange(answers.shape[1]), answers]
+    if (types < 0).any():
+        raise ValueError("answer index out of range for its question")
+    if SCORER:
+        return np.round(SCORER.score_sheets(answers), SCORE_DECIMALS)
+    return (types[:, :, None] == np.arange(TYPE_COUNT)).sum(axis=1, dtype=np.int32)
+
+
+def classify(scores: np.ndarray):
+    """Classifies an N × K score matrix with the same rules as quiz_logic.calculate_result.
+
+    NEUTRAL when every type ties, POLY when the top three tie, MIXED when the leader is
+    at most MIXED_MAX_GAP points ahead, the dominant type otherwise.
+
+    Returns (codes, dominant, second): codes index RESULT_KEYS, dominant and second are
+    the leading and runner-up type indices (meaningful for dominant and MIXED rows).
+    """
+    scores = np.asarray(scores)
+    rows = np.arange(scores.shape[0])
+
+    # argmax returns the first maximum, i.e. the same type a stable descending sort puts first.
+    dominant = scores.argmax(axis=1)
+    top = scores[rows, dominant]
+    rest = scores.astype(np.float64)
+    rest[rows, dominant] = -np.inf
+    second = rest.argmax(axis=1)
+    runner_up = scores[rows, second]
+    third = np.partition(scores, TYPE_COUNT - 3, axis=1)[:, TYPE_COUNT - 3]
+
+    codes = dominant.copy()
+    codes[top - runner_up <= MIXED_MAX_GAP] = MIXED
+    codes[(top == runner_up) & (runner_up == third)] = POLY
+    codes[(scores == top[:, None]).all(axis=1)] = NEUTRAL
+    return codes, dominant, second
+
+
+def score_batch(scores: np.ndarray):
+    """Returns (result_keys, titles) object arrays for an N × K score matrix."""
+    codes, dominant, second = classify(scores)
+    titles = np.empty(codes.shape[0], dtype=object)
+
+    is_dominant = codes < TYPE_COUNT
+    titles[is_dominant] = DOMINANT_TITLES[dominant[is_dominant]]
+    is_mixed = codes == MIXED
+    titles[is_mixed] = MIXED_TITLES[dominant[is_mixed], second[is_mixed]]
+    titles[codes == POLY] = POLY_TITLE
+    titles[codes == NEUTRAL] = NEUTRAL_TITLE
+    return RESULT_KEYS[codes], titles
+
+
+def score_answer_sheets(answers: np.ndarray):
+    """Returns (result_keys, titles) for an N × total_questions matrix of option indices."""
+    return score_batch(scores_from_answers(answers))
+
+
+def reachable_scores(total_questions: int = QUIZ.total_questions) -> np.ndarray:
+    """Every score vector whose counters add up to total_questions."""
+    vectors = [
+        counts for counts in itertools.product(range(total_questions + 1), repeat=TYPE_COUNT)
+        if sum(counts) == total_questions
+    ]
+    return np.array(vectors, dtype=np.int32)
+
+
+def map_answer_log_segment(path: str) -> np.ndarray:
+    """Memory-maps one answer log segment as a structured array; nothing is read or parsed up front.
+
+    A partial record at the end, left by a crash mid-write, is ignored.
+    """
+    count = os.path.getsize(path) // ANSWER_LOG_DTYPE.itemsize
+    if not count:
+        return np.empty(0, dtype=ANSWER_LOG_DTYPE)
+    return np.memmap(path, dtype=ANSWER_LOG_DTYPE, mode='r', shape=(count,))
+
+
+def map_answer_log(directory: str) -> list:
+    """Memory-maps every segment of the answer log in directory, oldest first."""
+    return [map_answer_log_segment(path) for path in segment_paths(directory)]
+
+
+def answer_sheets_from_log(segments: list, total_questions: int = QUIZ.total_questions) -> np.ndarray:
+    """Rebuilds complete answer sheets (N × total_questions option indices) from answer log segments.
+
+    A user's answers are read in time order; a repeated question starts a new run, and only
+    runs that answered every question are returned.
+    """
+    records = np.concatenate(segments) if segments else np.empty(0, dtype=ANSWER_LOG_DTYPE)
+    records = records[np.lexsort((records['timestamp'], records['user_id']))]
+    sheets, sheet, user_id = [], {}, None
+    for record_user, question, answer in zip(records['user_id'].tolist(), records['question'].tolist(),
+                                             records['answer'].tolist()):
+        if record_user != user_id or question in sheet:
+            sheet, user_id = {}, record_user
+        sheet[question] = answer
+        if len(sheet) == total_questions:
+            sheets.append([sheet[q_num] for q_num in range(total_questions)])
+            sheet = {}
+    return np.array(sheets, dtype=np.int64).reshape(-1, total_questions)
+
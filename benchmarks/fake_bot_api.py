@@ -0,0 +1,169 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, deque
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Quiz", "username": "quiz_bot"}
+
+
+def message_update(user_id: int, text: str) -> dict:
+    """Builds the body of a private-chat text message Update (update_id is assigned on push)."""
+    message = {
+        "message_id": 0,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+        "text": text,
+    }
+    if text.startswith('/'):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"message": message}
+
+
+def callback_update(user_id: int, message_id: int, data: str) -> dict:
+    """Builds the body of an Update for a tap on an inline button of the given bot message."""
+    return {"callback_query": {
+        "id": f"{user_id}:{message_id}:{data}",
+        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+        "chat_instance": str(user_id),
+        "data": data,
+        "message": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "text": "",
+        },
+    }}
+
+
+def update_chat_id(update: dict) -> int:
+    if 'callback_query' in update:
+        return update['callback_query']['message']['chat']['id']
+    return update['message']['chat']['id']
+
+
+class FakeBotApi:
+    """A local stand-in for the Telegram Bot API, for benchmarks and offline replay.
+
+    Serves getUpdates from an in-memory queue (with long polling) and answers every other
+    method with a plausible result, counting calls per method. Every call other than
+    getUpdates is passed to on_send as (method, params, result, receive_time), and every update
+    handed to the bot to on_deliver as (update, delivery_time).
+
+    With flood_limit set, message-sending calls beyond that many per second are refused
+    with 429 and retry_after, like Telegram's flood control.
+    """
+
+    def __init__(self, on_send=None, on_deliver=None, flood_limit: int = None):
+        self.on_send = on_send
+        self.on_deliver = on_deliver
+        self.flood_limit = flood_limit
+        self._flood_window = (0, 0)
+        self.calls = Counter()
+        self._updates = deque()
+        self._new_update = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._next_delivery = 1
+        self._message_ids = itertools.count(1)
+        self._runner = None
+        self.url = None
+
+    def push_update(self, update: dict) -> None:
+        update = dict(update, update_id=next(self._update_ids))
+        self._updates.append(update)
+        self._new_update.set()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_route('*', '/bot{token}/{method}', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        received_at = time.perf_counter()
+        method = request.match_info['method']
+        self.calls[method] += 1
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+
+        if method == 'getUpdates':
+            updates = await self.get_updates(int(params.get('offset', 0)), float(params.get('timeout', 0)))
+            return web.json_response({"ok": True, "result": updates})
+
+        if method in ('sendMessage', 'editMessageText') and self.flooded():
+            self.calls['429'] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+
+        if method == 'getMe':
+            result = BOT_USER
+        elif method in ('sendMessage', 'editMessageText'):
+            result = self.message_result(params)
+        else:
+            result = True
+        if self.on_send:
+            self.on_send(method, params, result, received_at)
+        return web.json_response({"ok": True, "result": result})
+
+    def flooded(self) -> bool:
+        if not self.flood_limit:
+            return False
+        second = int(time.monotonic())
+        window, count = self._flood_window
+        count = count + 1 if window == second else 1
+        self._flood_window = (second, count)
+        return count > self.flood_limit
+
+    async def get_updates(self, offset: int, timeout: float) -> list:
+        while self._updates and self._updates[0]['update_id'] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        updates = list(itertools.islice(self._updates, 100))
+        if self.on_deliver:
+            delivered_at = time.perf_counter()
+            for update in updates:
+                if update['update_id'] >= self._next_delivery:
+                    self.on_deliver(update, delivered_at)
+            if updates:
+                self._next_delivery = updates[-1]['update_id'] + 1
+        return updates
+
+    def message_result(self, params: dict) -> dict:
+        chat_id = int(params['chat_id'])
+        message_id = int(params.get('message_id') or next(self._message_ids))
+        result = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get('text', ''),
+        }
+        if params.get('reply_markup'):
+            markup = params['reply_markup']
+            markup = json.loads(markup) if isinstance(markup, str) else markup
+            if 'inline_keyboard' in markup:
+                result["reply_markup"] = markup
+        return result
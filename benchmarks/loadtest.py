@@ -0,0 +1,172 @@
+"""Measures how many quiz completions per second bot.py sustains against a local fake Bot API.
+
+Run from the repository root:
+
+    python -m benchmarks.loadtest --users 200 --workers 8
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+
+from benchmarks.fake_bot_api import FakeBotApi, callback_update, message_update, update_chat_id
+
+TOKEN = '123456:loadtest'
+
+
+def current_rss_kb() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return 0
+
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+class SimulatedUsers:
+    """Closed-loop users: each sends /start, then answers every question as soon as it arrives.
+
+    Works with both Reply Keyboard questions (answers are text messages) and inline ones
+    (answers are button taps on the edited message).
+    """
+
+    def __init__(self, api: FakeBotApi, users: int, seed: int):
+        self.api = api
+        self.users = users
+        self.random = random.Random(seed)
+        self.delivered_at = {}
+        self.latencies = []
+        self.completed = 0
+        self.done = asyncio.Event()
+
+    def start(self) -> None:
+        for user_id in range(1, self.users + 1):
+            self.api.push_update(message_update(user_id, '/start'))
+
+    def on_deliver(self, update: dict, delivered_at: float) -> None:
+        self.delivered_at[update_chat_id(update)] = delivered_at
+
+    def on_send(self, method: str, params: dict, result, received_at: float) -> None:
+        if method == 'editMessageText':
+            markup = json.loads(params.get('reply_markup') or '{}')
+        elif method == 'sendMessage' and params.get('reply_markup'):
+            markup = json.loads(params['reply_markup'])
+        else:
+            return
+        chat_id = int(params['chat_id'])
+        self.latencies.append(received_at - self.delivered_at[chat_id])
+        if 'keyboard' in markup:
+            answer = self.random.choice(markup['keyboard'][0])['text']
+            self.api.push_update(message_update(chat_id, answer))
+        elif 'inline_keyboard' in markup:
+            button = self.random.choice(markup['inline_keyboard'][0])
+            self.api.push_update(callback_update(chat_id, result['message_id'], button['callback_data']))
+        else:
+            self.completed += 1
+            if self.completed == self.users:
+                self.done.set()
+
+
+async def run_load_test(users: int, workers: int = 1, seed: int = 0, timeout: float = 300,
+                        inline_keyboard: bool = False, stateless: bool = False, send_rate: float = 0,
+                        flood_limit: int = None, record_updates: str = None) -> dict:
+    """Runs `users` complete quizzes through the real Application and returns the measurements.
+
+    send_rate is the bot's global send budget (0 = unthrottled, to measure raw capacity);
+    flood_limit makes the fake API answer 429 above that many messages per second.
+    record_updates saves the generated traffic for benchmarks/replay.py.
+    """
+    from bot import build_application
+
+    # bot.py configures INFO logging on import; per-request httpx logs would dominate the run.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    api = FakeBotApi(flood_limit=flood_limit)
+    simulation = SimulatedUsers(api, users, seed)
+    api.on_send, api.on_deliver = simulation.on_send, simulation.on_deliver
+    base_url = await api.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        application = build_application(
+            TOKEN, concurrent_updates=workers, base_url=base_url,
+            persistence_path=os.path.join(tmp, 'loadtest.sqlite3'), funnel_path=os.path.join(tmp, 'funnel.bin'),
+            stats_path=os.path.join(tmp, 'result_stats.json'), answer_log_dir=os.path.join(tmp, 'answer_log'),
+            inline_keyboard=inline_keyboard, record_updates=record_updates,
+            session_secret=b'loadtest' if stateless else None, send_rate=send_rate, per_chat_rate=0,
+        )
+        async with application:
+            await application.updater.start_polling(poll_interval=0, timeout=1)
+            await application.start()
+
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            simulation.start()
+            try:
+                await asyncio.wait_for(simulation.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                logging.error("Timed out with %d/%d quizzes completed", simulation.completed, users)
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+
+            await application.updater.stop()
+            await application.stop()
+            await application.post_shutdown(application)
+    await api.stop()
+
+    latencies = sorted(simulation.latencies)
+    return {
+        'users': users,
+        'workers': workers,
+        'completed': simulation.completed,
+        'seconds': wall,
+        'completions_per_second': simulation.completed / wall,
+        'updates_per_second': len(latencies) / wall,
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p95_ms': percentile(latencies, 95) * 1000,
+        'latency_p99_ms': percentile(latencies, 99) * 1000,
+        'cpu_seconds': cpu,
+        'cpu_percent': 100 * cpu / wall,
+        'rss_kb': current_rss_kb(),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'api_calls': dict(api.calls),
+        'rate_limiter': application.bot.rate_limiter.stats(),
+        'persistence': application.persistence.stats() if application.persistence else None,
+        'update_processor': (application.update_processor.stats()
+                             if hasattr(application.update_processor, 'stats') else None),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100, help="number of concurrent simulated users")
+    parser.add_argument('--workers', type=int, default=1, help="CONCURRENT_UPDATES for the bot")
+    parser.add_argument('--inline', action='store_true', help="use inline keyboards (QUIZ_KEYBOARD=inline)")
+    parser.add_argument('--stateless', action='store_true', help="use stateless callback_data sessions")
+    parser.add_argument('--send-rate', type=float, default=0, help="bot's global messages/s budget, 0 = unlimited")
+    parser.add_argument('--flood-limit', type=int, help="fake API returns 429 above this many messages/s")
+    parser.add_argument('--record', help="also record the generated updates to this gzip file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(
+        args.users, args.workers, args.seed, args.timeout, args.inline, args.stateless, args.send_rate, args.flood_limit,
+        args.record,
+    ))
+    # CPU and RSS cover the whole process, i.e. the bot plus the fake API and simulated users.
+    for key, value in report.items():
+        print(f"{key:>24}: {value:.2f}" if isinstance(value, float) else f"{key:>24}: {value}")
+
+
+if __name__ == '__main__':
+    main()
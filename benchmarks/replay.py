@@ -0,0 +1,145 @@
+"""Replays a recorded update stream (RECORD_UPDATES) through bot.py against a local fake Bot API.
+
+Run from the repository root:
+
+    python -m benchmarks.replay updates.jsonl.gz --workers 8
+    python -m benchmarks.replay updates.jsonl.gz --speed 1    # real-time pacing
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.fake_bot_api import FakeBotApi, update_chat_id
+from benchmarks.loadtest import TOKEN, current_rss_kb, percentile
+from update_recorder import read_recording
+
+
+class ReplayTracker:
+    """Measures, per update, the time from its delivery to the bot's first reply in that chat."""
+
+    def __init__(self):
+        self.waiting_since = {}
+        self.latencies = []
+        self.delivered = 0
+
+    def on_deliver(self, update: dict, delivered_at: float) -> None:
+        self.delivered += 1
+        chat_id = update_chat_id(update)
+        self.waiting_since.setdefault(chat_id, delivered_at)
+
+    def on_send(self, method: str, params: dict, result, received_at: float) -> None:
+        if 'chat_id' not in params:
+            return
+        delivered_at = self.waiting_since.pop(int(params['chat_id']), None)
+        if delivered_at is not None:
+            self.latencies.append(received_at - delivered_at)
+
+
+async def push_recording(api: FakeBotApi, recording: list, speed: float = None) -> None:
+    """Pushes the recorded updates in order; with speed, keeps their original spacing divided by speed."""
+    if not speed:
+        for _, update in recording:
+            api.push_update(update)
+        return
+    first_time, started = recording[0][0], time.perf_counter()
+    for received_at, update in recording:
+        delay = (received_at - first_time) / speed - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        api.push_update(update)
+
+
+async def run_replay(path: str, workers: int = 1, speed: float = None, inline_keyboard: bool = False,
+                     session_secret: bytes = None, send_rate: float = 0, timeout: float = 600) -> dict:
+    """Replays the recording at path through the real Application and returns the measurements.
+
+    Stateless-mode recordings only replay with the session_secret they were recorded with.
+    """
+    from bot import build_application
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Each update gets a fresh update_id when pushed, in recorded order.
+    recording = [(received_at, {key: value for key, value in update.items() if key != 'update_id'})
+                 for received_at, update in read_recording(path)]
+    if not recording:
+        raise SystemExit(f"{path} contains no updates")
+
+    tracker = ReplayTracker()
+    api = FakeBotApi(on_send=tracker.on_send, on_deliver=tracker.on_deliver)
+    base_url = await api.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        application = build_application(
+            TOKEN, concurrent_updates=workers, base_url=base_url,
+            persistence_path=os.path.join(tmp, 'replay.sqlite3'), funnel_path=os.path.join(tmp, 'funnel.bin'),
+            stats_path=os.path.join(tmp, 'result_stats.json'), answer_log_dir=os.path.join(tmp, 'answer_log'),
+            inline_keyboard=inline_keyboard, session_secret=session_secret, send_rate=send_rate, per_chat_rate=0,
+        )
+        async with application:
+            await application.updater.start_polling(poll_interval=0, timeout=1)
+            await application.start()
+
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            try:
+                await asyncio.wait_for(_replay_until_idle(api, application, tracker, recording, speed), timeout)
+            except asyncio.TimeoutError:
+                logging.error("Timed out with %d/%d updates delivered", tracker.delivered, len(recording))
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+
+            await application.updater.stop()
+            await application.stop()
+            await application.post_shutdown(application)
+    await api.stop()
+
+    latencies = sorted(tracker.latencies)
+    return {
+        'updates': len(recording),
+        'recorded_seconds': recording[-1][0] - recording[0][0],
+        'workers': workers,
+        'speed': speed or 'max',
+        'seconds': wall,
+        'updates_per_second': tracker.delivered / wall,
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p95_ms': percentile(latencies, 95) * 1000,
+        'latency_p99_ms': percentile(latencies, 99) * 1000,
+        'cpu_seconds': cpu,
+        'cpu_percent': 100 * cpu / wall,
+        'rss_kb': current_rss_kb(),
+        'api_calls': dict(api.calls),
+    }
+
+
+async def _replay_until_idle(api, application, tracker, recording, speed) -> None:
+    await push_recording(api, recording, speed)
+    # Done once every update was fetched and nothing is queued or being processed.
+    while (tracker.delivered < len(recording) or not application.update_queue.empty()
+           or application.update_processor.current_concurrent_updates):
+        await asyncio.sleep(0.01)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording', help="gzip JSON-lines file written with RECORD_UPDATES")
+    parser.add_argument('--workers', type=int, default=1, help="CONCURRENT_UPDATES for the bot")
+    parser.add_argument('--speed', type=float, help="replay at this multiple of real time (default: as fast as possible)")
+    parser.add_argument('--inline', action='store_true', help="use inline keyboards (QUIZ_KEYBOARD=inline)")
+    parser.add_argument('--session-secret', help="STATELESS_SESSION_SECRET the recording was made with")
+    parser.add_argument('--send-rate', type=float, default=0, help="bot's global messages/s budget, 0 = unlimited")
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_replay(
+        args.recording, args.workers, args.speed, args.inline,
+        args.session_secret.encode() if args.session_secret else None, args.send_rate, args.timeout,
+    ))
+    for key, value in report.items():
+        print(f"{key:>24}: {value:.2f}" if isinstance(value, float) else f"{key:>24}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,95 @@
 import os
 import logging
-import json
+import warnings
 from dotenv import load_dotenv
-from telegram import Update, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import (
+    Update,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+    ReplyKeyboardRemove,
+)
+from telegram.warnings import PTBUserWarning
 from telegram.ext import (
     Application,
+    CallbackQueryHandler,
     CommandHandler,
     MessageHandler,
     filters,
     ConversationHandler,
     ContextTypes,
-    PicklePersistence,
+    TypeHandler,
+)
+from adaptive import AdaptiveEngine
+from answer_log import AnswerLog, flush_answer_log
+from error_reporting import ErrorDigest, send_error_digest
+from funnel import QuestionFunnel, save_funnel
+from metrics import ANSWERS, FUNNEL, REGISTRY, Gauge, InstrumentedRequest, MetricsServer, timed
+from persistence import SQLitePersistence
+from rate_limiter import PRIORITY_RESULT, PriorityRateLimiter
+from quiz_data import QUIZ, RESULT_KEYS
+from quiz_logic import lookup_result, lookup_result_key, settled_counts, tables_supported
+from result_stats import ResultStats, save_result_stats
+from scoring import WeightedScorer
+from session import QuizSession
+from session_expiry import SessionSweeper, sweep_sessions
+from stateless import PREFIX as STATELESS_PREFIX, ProgressCodec
+from update_processor import PerUserOrderedProcessor
+from update_recorder import RECORDER_GROUP, UpdateRecorder, flush_update_recorder
+from webhook import run_webhook
+
+
+questions = QUIZ.questions
+TOTAL_QUESTIONS = QUIZ.total_questions
+SCORE_TYPES = QUIZ.score_types
+ANSWER_INDEX = QUIZ.answer_index
+OPTION_TYPES = QUIZ.option_types
+# Weighted quizzes, and ones with too many types for the lookup tables, are scored from their answers.
+SCORER = None if tables_supported(QUIZ) else WeightedScorer(QUIZ)
+
+
+def build_question_renders(questions, inline=False):
+    """Renders every question's Markdown text and keyboard once, indexed by question number.
+
+    The keyboard is a Reply Keyboard, or with inline=True an inline keyboard whose buttons
+    carry "<question>:<option>" as callback_data.
+    """
+    renders = []
+    for q_num, question_data in enumerate(questions):
+        options_text = []
+        keyboard_buttons = []
+
+        for o_num, option in enumerate(question_data["options"]):
+            options_text.append(f"*{option['key']}*. {option['text']}")
+            if inline:
+                keyboard_buttons.append(InlineKeyboardButton(option['key'], callback_data=f"{q_num}:{o_num}"))
+            else:
+                keyboard_buttons.append(KeyboardButton(option['key']))
+
+        options_block = ' \n'.join(options_text)
+        message_text = (
+            f"Вопрос {q_num + 1} из {TOTAL_QUESTIONS}\n\n"
+            f"*{question_data['text']}*\n\n"
+            f"{options_block}\n\n"
+            "💡 *Важно:* Для ответа, пожалуйста, используйте только кнопки с буквами."
+        )
+
+        # Telegram objects are immutable, so one markup instance can be shared by every send.
+        if inline:
+            reply_markup = InlineKeyboardMarkup([keyboard_buttons])
+        else:
+            reply_markup = ReplyKeyboardMarkup([keyboard_buttons], one_time_keyboard=True, resize_keyboard=True)
+        renders.append((message_text, reply_markup))
+    return tuple(renders)
+
+QUESTION_RENDERS = build_question_renders(questions)
+INLINE_QUESTION_RENDERS = build_question_renders(questions, inline=True)
+
+INVALID_ANSWER_TEXTS = tuple(
+    f"❌ Неверный ответ. Пожалуйста, выберите одну из букв: {', '.join(option['key'] for option in question_data['options'])}."
+    for question_data in questions
 )
-from quiz_logic import calculate_result
-
-
-def load_quiz_data():
-    DATA_PATH = os.path.join(os.path.dirname(__file__), 'script.json')
-    try:
-        with open(DATA_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            required_keys = {'questions', 'total_questions', 'interpretations', 'type_names'}
-            if not required_keys.issubset(data.keys()):
-                logging.error("script.json missing keys: %s", required_keys - set(data.keys()))
-                return None
-            if not isinstance(data['questions'], list):
-                logging.error("script.json: 'questions' must be a list")
-                return None
-            return data
-    except FileNotFoundError:
-        logging.error("script.json not found.")
-        return None
-
-QUIZ_DATA = load_quiz_data()
-if not QUIZ_DATA:
-    exit(1)
-
-questions = QUIZ_DATA['questions']
-TOTAL_QUESTIONS = QUIZ_DATA['total_questions']
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -46,172 +98,643 @@ logger = logging.getLogger(__name__)
 
 (QUIZ_IN_PROGRESS) = range(1)
 
+# bot_data keys set by build_application: inline keyboard flag, stateless-mode codec, error digest,
+# the idle session sweeper, the per-question funnel, the result distribution, the answer log, the
+# early finish flag, the adaptive question order engine and the active sessions gauge.
+INLINE_KEYBOARD = 'inline_keyboard'
+PROGRESS_CODEC = 'progress_codec'
+ERROR_DIGEST = 'error_digest'
+SESSION_SWEEPER = 'session_sweeper'
+QUESTION_FUNNEL = 'question_funnel'
+RESULT_STATS = 'result_stats'
+ANSWER_LOG = 'answer_log'
+EARLY_FINISH = 'early_finish'
+ADAPTIVE_ENGINE = 'adaptive_engine'
+ACTIVE_SESSIONS = 'active_sessions'
+
+WELCOME_MESSAGE = (
+    "Добро пожаловать в диагностическую игру: *Какой ты экономический тип?*\n\n"
+    "Ответьте на 16 вопросов. Выбирайте честно, *первый вариант, который пришёл в голову*. "
+    "По итогам узнаете свой экономический тип."
+)
+
+# Inline answers are meant to be tracked per user, not per message; the quiz only ever has
+# one live question message, and stale taps are rejected in handle_choice.
+warnings.filterwarnings("ignore", message="If 'per_message=False'", category=PTBUserWarning)
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Logs the error and sends a notification to the admin chat."""
+    """Logs the error and counts it towards the next admin error digest."""
     logger.exception("Exception in handler: %s", context.error)
-    try:
-        admin_chat = os.getenv('ADMIN_CHAT_ID')
-        if admin_chat and isinstance(context.application, Application):
-            await context.application.bot.send_message(
-                chat_id=int(admin_chat),
-                text=f"Bot error: {context.error}"
-            )
-    except Exception:
-        logger.exception("Failed to send error message to admin")
+    context.bot_data[ERROR_DIGEST].record(context.error)
 
 
-def get_score_type_for_key(q_num, answer_key):
-    """Finds the score_type (M, S, P, C) for a given answer key (A, B, C, D)"""
-    question_data = questions[q_num]
-    for option in question_data['options']:
-        if option['key'] == answer_key:
-            return option['score_type']
-    return None
+def quiz_over(counts, answered: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """True once every question is answered or, with early finish on, no remaining answer can change the result."""
+    return answered >= TOTAL_QUESTIONS or (context.bot_data.get(EARLY_FINISH) and settled_counts(counts) is not None)
 
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    context.user_data['question_num'] = 0
-    context.user_data['scores'] = {"M": 0, "S": 0, "P": 0, "C": 0}
+def record_answer(session: QuizSession, q_num: int, o_num: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Scores the answer and moves the session to its next question; returns False once the quiz is over."""
+    session.counts[OPTION_TYPES[q_num][o_num]] += 1
+    if session.answers is not None:
+        session.answers[q_num] = o_num + 1
+    engine = context.bot_data.get(ADAPTIVE_ENGINE)
+    if not engine:
+        session.question_num += 1
+        return not quiz_over(session.counts, session.question_num, context)
+    next_q_num = engine.next_question(session.answers)
+    if next_q_num is None:
+        return False
+    session.question_num = next_q_num
+    return True
 
-    welcome_message = (
-        "Добро пожаловать в диагностическую игру: *Какой ты экономический тип?*\n\n"
-        "Ответьте на 16 вопросов. Выбирайте честно, *первый вариант, который пришёл в голову*. "
-        "По итогам узнаете свой экономический тип."
-    )
+
+def final_counts(counts, context: ContextTypes.DEFAULT_TYPE, answers=None):
+    """The counters to read the result from: for a run finished early, a complete run with the same result."""
+    engine = context.bot_data.get(ADAPTIVE_ENGINE)
+    if engine and answers is not None:
+        return engine.outcome(answers, counts)
+    return settled_counts(counts) or counts
+
+
+def run_result(counts, context: ContextTypes.DEFAULT_TYPE, answers=None):
+    """Returns (result_key, title, text, scores by type) for a finished run.
+
+    answers are per-question bytes (see QuizSession.answers); weighted scoring needs them.
+    """
+    if SCORER:
+        scores = SCORER.score_answers(answers)
+        return (*SCORER.result(scores), SCORER.by_type(scores))
+    result_counts = final_counts(counts, context, answers)
+    return (lookup_result_key(result_counts), *lookup_result(result_counts), dict(zip(SCORE_TYPES, counts)))
+
+
+def pending_questions(session: QuizSession) -> list:
+    """The run's unanswered questions in question order."""
+    if session.answers is not None:
+        return [q_num for q_num, answer in enumerate(session.answers) if not answer]
+    return list(range(session.question_num, TOTAL_QUESTIONS))
+
+
+def begin_session(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Starts a fresh run in user_data, on the first question or the adaptive engine's pick."""
+    engine = context.bot_data.get(ADAPTIVE_ENGINE)
+    session = context.user_data
+    if not session.active:
+        context.bot_data[ACTIVE_SESSIONS].inc()
+    session.begin(len(SCORE_TYPES), TOTAL_QUESTIONS if engine or SCORER else None)
+    if engine:
+        session.question_num = engine.next_question(session.answers)
+    FUNNEL.inc('started')
+
+
+def end_session(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Clears the user's run, keeping the active sessions gauge in step."""
+    if context.user_data.active:
+        context.bot_data[ACTIVE_SESSIONS].inc(-1)
+    context.user_data.clear()
+
+
+async def touch_session(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Runs before every other handler and records the user's activity for the session sweeper."""
+    if update.effective_user:
+        context.bot_data[SESSION_SWEEPER].touch(update.effective_user.id, context.user_data)
+
+
+@timed('start')
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    begin_session(context)
 
     if not update.message:
         return ConversationHandler.END
 
-    await update.message.reply_text(welcome_message, parse_mode="Markdown")
+    await update.message.reply_text(WELCOME_MESSAGE, parse_mode="Markdown")
     return await ask_question(update, context)
 
 
+@timed('ask_question')
 async def ask_question(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Sends the current question with full options text and Reply Keyboard buttons."""
-    q_num = context.user_data.get('question_num')
+    """Sends the current question with full options text and Reply or inline keyboard buttons."""
+    q_num = context.user_data.question_num
     if q_num is None or q_num >= TOTAL_QUESTIONS:
         return await show_result(update, context)
 
-    question_data = questions[q_num]
-
-    options_text = []
-    keyboard_buttons = []
-
-    for option in question_data["options"]:
-        options_text.append(f"*{option['key']}*. {option['text']}")
-        keyboard_buttons.append(KeyboardButton(option['key']))
-
-    message_text = (
-        f"Вопрос {q_num + 1} из {TOTAL_QUESTIONS}\n\n"
-        f"*{question_data['text']}*\n\n"
-        f"{' \n'.join(options_text)}\n\n"
-        "💡 *Важно:* Для ответа, пожалуйста, используйте только кнопки с буквами."
-    )
-
-    keyboard = [keyboard_buttons]
-    reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-
+    if context.bot_data.get(INLINE_KEYBOARD):
+        message_text, reply_markup = INLINE_QUESTION_RENDERS[q_num]
+    else:
+        message_text, reply_markup = QUESTION_RENDERS[q_num]
     await update.message.reply_text(message_text, reply_markup=reply_markup, parse_mode="Markdown")
+    context.bot_data[QUESTION_FUNNEL].reach(q_num)
 
     return QUIZ_IN_PROGRESS
 
 
+@timed('handle_answer')
 async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
-    Handles a user's answer (text input from the Reply Keyboard).
-    Records the score, and asks the next question or shows the result.
+    Handles a user's answer (text input from the Reply Keyboard), or several at once typed
+    as a string of keys. Records the score, and asks the next question or shows the result.
     """
-    answer_key = update.message.text.upper().strip() 
-    
-    q_num = context.user_data.get('question_num')
+    session = context.user_data
+    q_num = session.question_num
     if q_num is None:
-        await update.message.reply_text("Сессия потеряна. Введите /start, чтобы начать заново.", reply_markup=ReplyKeyboardRemove())
+        # The conversation outlived its session; the sweeper ends both, so this is only a safeguard.
+        await session_lost(update, context)
         return ConversationHandler.END
-        
-    valid_keys = [option['key'] for option in questions[q_num]['options']]
-    
-    if answer_key not in valid_keys:
-        await update.message.reply_text(
-            f"❌ Неверный ответ. Пожалуйста, выберите одну из букв: {', '.join(valid_keys)}."
-        )
-        return QUIZ_IN_PROGRESS 
 
-    scores = context.user_data['scores']
-    
-    profile_type = get_score_type_for_key(q_num, answer_key)
-    if profile_type:
-        scores[profile_type] += 1
-    
-    context.user_data['question_num'] += 1
+    text = update.message.text.strip()
+    o_num = ANSWER_INDEX[q_num].get(text)
+    if o_num is None and len(answer_keys(text)) > 1:
+        return await apply_answer_sheet(update, context, text, shown_q_num=q_num)
+    if o_num is None:
+        context.bot_data[QUESTION_FUNNEL].reject(q_num)
+        await update.message.reply_text(INVALID_ANSWER_TEXTS[q_num])
+        return QUIZ_IN_PROGRESS
+
+    ANSWERS.inc(q_num, SCORE_TYPES[OPTION_TYPES[q_num][o_num]])
+    context.bot_data[QUESTION_FUNNEL].answer(q_num)
+    context.bot_data[ANSWER_LOG].append(update.effective_user.id, q_num, o_num)
     
-    if context.user_data['question_num'] < TOTAL_QUESTIONS:
+    if record_answer(session, q_num, o_num, context):
         return await ask_question(update, context)
     else:
         return await show_result(update, context)
 
 
-async def show_result(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Calculates and displays the final result, and removes the keyboard."""
-    scores = context.user_data['scores']
-    
-    title, interpretation = calculate_result(scores)
+def answer_keys(text: str) -> str:
+    """Strips spaces and commas from a string of answer keys such as "A B, C D"."""
+    return ''.join(char for char in text if not char.isspace() and char not in ',;')
+
+
+async def apply_answer_sheet(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str,
+                             shown_q_num: int = None) -> int:
+    """
+    Answers the unanswered questions in question order from a string of keys, e.g. "ABCDDCBA",
+    then asks the next remaining question or shows the result. shown_q_num is the question
+    already on screen, the only one the funnel has counted as reached.
+    The whole string is validated before any answer is scored; without a run in progress a
+    new one is started only for a valid string.
+    """
+    session = context.user_data
+    question_funnel = context.bot_data[QUESTION_FUNNEL]
+    in_run = session.active
+    keys = answer_keys(text)
+    pending = pending_questions(session) if in_run else list(range(TOTAL_QUESTIONS))
+    if len(keys) > len(pending):
+        if in_run:
+            question_funnel.reject(session.question_num)
+        await update.message.reply_text(f"❌ Ответов больше, чем осталось вопросов ({len(pending)}).")
+        return QUIZ_IN_PROGRESS if in_run else ConversationHandler.END
+
+    options = [ANSWER_INDEX[q_num].get(key) for q_num, key in zip(pending, keys)]
+    if None in options:
+        position = options.index(None)
+        if in_run:
+            question_funnel.reject(pending[position])
+        await update.message.reply_text(
+            f"Вопрос {pending[position] + 1}: {INVALID_ANSWER_TEXTS[pending[position]]}\n"
+            "Ни один ответ из этого сообщения не засчитан."
+        )
+        return QUIZ_IN_PROGRESS if in_run else ConversationHandler.END
+
+    if not in_run:
+        begin_session(context)
+    answer_log = context.bot_data[ANSWER_LOG]
+    for q_num, o_num in zip(pending, options):
+        if q_num != shown_q_num:
+            question_funnel.reach(q_num)
+        ANSWERS.inc(q_num, SCORE_TYPES[OPTION_TYPES[q_num][o_num]])
+        question_funnel.answer(q_num)
+        answer_log.append(update.effective_user.id, q_num, o_num)
+        if not record_answer(session, q_num, o_num, context):
+            return await show_result(update, context)
+    return await ask_question(update, context)
+
+
+@timed('bulk_answers')
+async def bulk_answers(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """/answers ABCD…: answers several questions with one message, starting a new run if none is in progress."""
+    if not context.args:
+        await update.message.reply_text("Отправьте ответы одной строкой, например: /answers ABCDDCBA")
+        return QUIZ_IN_PROGRESS if context.user_data.active else ConversationHandler.END
+    return await apply_answer_sheet(update, context, ''.join(context.args), context.user_data.question_num)
+
+
+@timed('handle_choice')
+async def handle_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """
+    Handles a tap on an inline answer button (callback_data "<question>:<option>").
+    Records the score and edits the same message into the next question or the result.
+    """
+    query = update.callback_query
+    session = context.user_data
+    q_num, o_num = map(int, query.data.split(':'))
+    if not session.active:
+        await query.answer("Сессия потеряна. Введите /start, чтобы начать заново.")
+        return ConversationHandler.END
+    if session.question_num != q_num:
+        await query.answer("Этот вопрос уже пройден.")
+        return QUIZ_IN_PROGRESS
+
+    await query.answer()
+    ANSWERS.inc(q_num, SCORE_TYPES[OPTION_TYPES[q_num][o_num]])
+    question_funnel = context.bot_data[QUESTION_FUNNEL]
+    question_funnel.answer(q_num)
+    context.bot_data[ANSWER_LOG].append(query.from_user.id, q_num, o_num)
+
+    if record_answer(session, q_num, o_num, context):
+        message_text, reply_markup = INLINE_QUESTION_RENDERS[session.question_num]
+        await query.edit_message_text(message_text, reply_markup=reply_markup, parse_mode="Markdown")
+        question_funnel.reach(session.question_num)
+        return QUIZ_IN_PROGRESS
+
+    result_key, title, interpretation, scores = run_result(session.counts, context, session.answers)
+    await context.bot.edit_message_text(
+        render_result(title, interpretation, scores, sum(session.counts)),
+        chat_id=query.message.chat.id,
+        message_id=query.message.message_id,
+        parse_mode="Markdown",
+        rate_limit_args=PRIORITY_RESULT,
+    )
+    context.bot_data[RESULT_STATS].record(result_key)
+    end_session(context)
+    FUNNEL.inc('completed')
+    return ConversationHandler.END
+
+
+async def session_lost(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Answers text sent outside a quiz, e.g. by a user whose session the sweeper dropped."""
+    await update.message.reply_text("Сессия потеряна. Введите /start, чтобы начать заново.", reply_markup=ReplyKeyboardRemove())
+
+
+async def expired_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Answers taps on buttons of a quiz that has already ended."""
+    await update.callback_query.answer("Тест уже завершён. Введите /start, чтобы начать заново.")
+
+
+def render_result(title: str, interpretation: str, scores: dict, answered: int) -> str:
+    """Builds the final result message for a finished run of `answered` questions."""
+    early_note = (
+        f"Результат определился досрочно, после {answered} из {TOTAL_QUESTIONS} вопросов.\n\n"
+        if answered < TOTAL_QUESTIONS else ""
+    )
     
-    result_text = (
+    return (
         f"--- *{title}* ---\n\n"
         f"{interpretation}\n\n"
-        f"Ваши итоговые баллы: M={scores['M']}, S={scores['S']}, P={scores['P']}, C={scores['C']}\n\n"
+        f"{early_note}"
+        f"Ваши итоговые баллы: {', '.join(f'{score_type}={score:g}' for score_type, score in scores.items())}\n\n"
         "Чтобы пройти тест снова, введите /start"
     )
-    
-    await update.message.reply_text(
-        result_text,
+
+
+@timed('show_result')
+async def show_result(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Calculates and displays the final result, and removes the keyboard."""
+    session = context.user_data
+    result_key, title, interpretation, scores = run_result(session.counts, context, session.answers)
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=render_result(title, interpretation, scores, sum(session.counts)),
         reply_markup=ReplyKeyboardRemove(),
-        parse_mode="Markdown"
+        parse_mode="Markdown",
+        rate_limit_args=PRIORITY_RESULT,
     )
         
-    context.user_data.clear()
+    context.bot_data[RESULT_STATS].record(result_key)
+    end_session(context)
+    FUNNEL.inc('completed')
     
     return ConversationHandler.END
 
 
+def stateless_keyboard(codec: ProgressCodec, user_id: int, answers: list, q_num: int) -> InlineKeyboardMarkup:
+    """Builds question q_num's buttons, each carrying the signed answers so far plus its own option."""
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(option['key'], callback_data=codec.encode(user_id, answers + [o_num]))
+        for o_num, option in enumerate(questions[q_num]['options'])
+    ]])
+
+
+@timed('start_stateless')
+async def start_stateless(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Starts a quiz whose whole progress travels in the inline buttons' callback_data."""
+    if not update.message:
+        return
+
+    FUNNEL.inc('started')
+    codec = context.bot_data[PROGRESS_CODEC]
+    await update.message.reply_text(WELCOME_MESSAGE, parse_mode="Markdown")
+    await update.message.reply_text(
+        INLINE_QUESTION_RENDERS[0][0],
+        reply_markup=stateless_keyboard(codec, update.effective_user.id, [], 0),
+        parse_mode="Markdown"
+    )
+    context.bot_data[QUESTION_FUNNEL].reach(0)
+
+
+@timed('handle_stateless_choice')
+async def handle_stateless_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handles a tap on a stateless inline button: rebuilds the answers from its callback_data
+    and edits the message into the next question or the result, without touching user_data.
+    """
+    query = update.callback_query
+    codec = context.bot_data[PROGRESS_CODEC]
+    answers = codec.decode(query.from_user.id, query.data)
+    if answers is None:
+        await query.answer("Кнопка недействительна. Введите /start, чтобы начать заново.")
+        return
+
+    await query.answer()
+    last_q_num = len(answers) - 1
+    counts = codec.counts(answers)
+    ANSWERS.inc(last_q_num, SCORE_TYPES[OPTION_TYPES[last_q_num][answers[last_q_num]]])
+    question_funnel = context.bot_data[QUESTION_FUNNEL]
+    question_funnel.answer(last_q_num)
+    context.bot_data[ANSWER_LOG].append(query.from_user.id, last_q_num, answers[last_q_num])
+    if not quiz_over(counts, len(answers), context):
+        q_num = len(answers)
+        await query.edit_message_text(
+            INLINE_QUESTION_RENDERS[q_num][0],
+            reply_markup=stateless_keyboard(codec, query.from_user.id, answers, q_num),
+            parse_mode="Markdown"
+        )
+        question_funnel.reach(q_num)
+    else:
+        result_key, title, interpretation, scores = run_result(
+            counts, context, bytes(o_num + 1 for o_num in answers)
+        )
+        await context.bot.edit_message_text(
+            render_result(title, interpretation, scores, len(answers)),
+            chat_id=query.message.chat.id,
+            message_id=query.message.message_id,
+            parse_mode="Markdown",
+            rate_limit_args=PRIORITY_RESULT,
+        )
+        context.bot_data[RESULT_STATS].record(result_key)
+        FUNNEL.inc('completed')
+
+
+async def funnel_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin command /funnel: per-question reached/answered/invalid/abandoned counts."""
+    await update.message.reply_text(
+        f"```\n{context.bot_data[QUESTION_FUNNEL].report()}\n```", parse_mode="Markdown"
+    )
+
+
+async def stats_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin command /stats: how many quizzes ended in each result, overall and for the last hour/day/week."""
+    snapshot = context.bot_data[RESULT_STATS].snapshot()
+    lines = [f"{'result':<10} {'total':>8} {'hour':>6} {'day':>6} {'week':>6}"]
+    for key in snapshot['total']:
+        counts = ' '.join(f"{snapshot[window][key]:>6}" for window in ('hour', 'day', 'week'))
+        lines.append(f"{QUIZ.type_names.get(key, key):<10} {snapshot['total'][key]:>8} {counts}")
+    await update.message.reply_text("```\n" + '\n'.join(lines) + "\n```", parse_mode="Markdown")
+
+
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel the quiz and clear session data."""
     await update.message.reply_text(
         "Тест отменён. Введите /start, чтобы начать заново.", 
         reply_markup=ReplyKeyboardRemove()
     )
-    context.user_data.clear()
+    end_session(context)
+    FUNNEL.inc('cancelled')
     return ConversationHandler.END
 
 
-def main() -> None:
-    """Run the bot."""
-    load_dotenv()
-    token = os.getenv("TELEGRAM_TOKEN")
-    if not token:
-        logger.error("TELEGRAM_TOKEN not found! Please set it in .env file.")
-        return
-
-    persistence = PicklePersistence(filepath='bot_data.pickle')
-    application = Application.builder().token(token).persistence(persistence).build()
-
+def build_application(token: str, concurrent_updates: int = 1, base_url: str = None,
+                      persistence_path: str = 'bot_data.sqlite3', inline_keyboard: bool = False,
+                      session_secret: bytes = None, send_rate: float = 30, per_chat_rate: float = 1,
+                      error_digest_window: float = 300, session_ttl: float = 3600,
+                      metrics_port: int = None, metrics_host: str = '127.0.0.1', admin_chat_id: int = None,
+                      funnel_path: str = 'funnel.bin', stats_path: str = 'result_stats.json',
+                      answer_log_dir: str = 'answer_log', record_updates: str = None,
+                      early_finish: bool = False, adaptive: AdaptiveEngine = None) -> Application:
+    """Builds the Application with persistence and all handlers registered.
+
+    With concurrent_updates > 1, updates of different users are handled in parallel by
+    that many workers while each user's updates keep their order. base_url points the bot
+    at another Bot API server, e.g. a local one for benchmarks. With inline_keyboard=True
+    questions use inline buttons and the quiz advances by editing a single message.
+
+    Passing session_secret switches to stateless sessions: progress is carried in signed
+    inline button data, so there is no ConversationHandler, user_data or persistence and
+    any number of replicas can serve any user.
+
+    Outgoing requests go through a PriorityRateLimiter allowing send_rate messages/s overall
+    and per_chat_rate per chat (0 disables either limit); results are sent before questions.
+    Handler errors reach admin_chat_id as one digest per kind of error every error_digest_window seconds.
+    Sessions of users idle for session_ttl seconds are evicted from memory and persistence
+    (0 keeps them forever) together with their conversation; their next answer is told to /start again.
+
+    Handler, Bot API and persistence timings are always collected; with metrics_port they
+    are served at http://metrics_host:metrics_port/metrics while the Application runs.
+
+    Per-question drop-off counts and the result distribution are saved to funnel_path and
+    stats_path every minute and on shutdown; admin_chat_id can read them with /funnel and /stats.
+    Every accepted answer is appended to the binary log in answer_log_dir (see answer_log.py).
+    With record_updates, every incoming update is also recorded to that gzip file for
+    benchmarks/replay.py. With early_finish=True a quiz ends as soon as its result can no
+    longer change (see quiz_logic.settled_counts).
+
+    With an adaptive engine (not in stateless mode) questions are asked in the order that
+    pins the result down fastest and the quiz ends once the engine is confident of the
+    result; early_finish is then not used (see adaptive.py). Neither works with weighted
+    scoring (see scoring.py), which is used when the quiz has fractional or multi-type
+    option weights or too many types for the lookup tables.
+
+    Outside stateless mode a string of answer keys, typed during the quiz or sent as
+    /answers ABCD…, answers the remaining questions in one message.
+    """
+    if SCORER and (early_finish or adaptive):
+        raise ValueError("early finish and adaptive question order need an unweighted quiz with few score types")
+    builder = (
+        Application.builder()
+        .token(token)
+        .context_types(ContextTypes(user_data=QuizSession))
+        .rate_limiter(PriorityRateLimiter(global_rate=send_rate, per_chat_rate=per_chat_rate))
+        .request(InstrumentedRequest(connection_pool_size=256))
+    )
+    if not session_secret:
+        builder = builder.persistence(SQLitePersistence(filepath=persistence_path))
+    if base_url:
+        builder = builder.base_url(f"{base_url.rstrip('/')}/bot")
+    if concurrent_updates > 1:
+        builder = builder.concurrent_updates(PerUserOrderedProcessor(concurrent_updates))
+    question_funnel = QuestionFunnel(TOTAL_QUESTIONS, funnel_path)
+    result_stats = ResultStats(SCORE_TYPES + RESULT_KEYS, stats_path)
+    answer_log = AnswerLog(answer_log_dir)
+    recorder = UpdateRecorder(record_updates) if record_updates else None
+    metrics_server = MetricsServer(metrics_host, metrics_port) if metrics_port else None
+
+    async def post_init(_: Application) -> None:
+        if ACTIVE_SESSIONS in application.bot_data:
+            # Sessions restored from persistence, counted once at startup.
+            application.bot_data[ACTIVE_SESSIONS].set(
+                sum(1 for session in application.user_data.values() if session.active)
+            )
+        if metrics_server:
+            await metrics_server.start()
+
+    async def post_shutdown(_: Application) -> None:
+        question_funnel.save()
+        result_stats.save()
+        await answer_log.close()
+        if recorder:
+            await recorder.close()
+        if metrics_server:
+            await metrics_server.stop()
+
+    builder = builder.post_init(post_init).post_shutdown(post_shutdown)
+    application = builder.build()
+
+    if recorder:
+        application.add_handler(TypeHandler(Update, recorder.record), group=RECORDER_GROUP)
+        application.job_queue.run_repeating(flush_update_recorder, interval=1, data=recorder)
+
+    rate_limiter = application.bot.rate_limiter
+    REGISTRY.register(Gauge(
+        'rate_limiter_queue_depth', "Outgoing requests waiting for the global send budget.",
+        lambda: rate_limiter.queue_depth,
+    ))
+    if application.persistence:
+        persistence = application.persistence
+        REGISTRY.register(Gauge(
+            'persistence_backlog', "Rows staged for the next SQLite write.", lambda: persistence.stats()['backlog'],
+        ))
+    update_processor = application.update_processor
+    if isinstance(update_processor, PerUserOrderedProcessor):
+        for key, doc in (
+            ('running', "Updates being handled by a worker."),
+            ('waiting_for_user', "Updates queued behind an earlier update of the same user."),
+            ('waiting_for_worker', "Updates waiting for a free worker."),
+            ('dropped', "Updates dropped because their user already had max_per_user queued."),
+        ):
+            REGISTRY.register(Gauge(
+                f'update_processor_{key}', doc, lambda key=key: update_processor.stats()[key],
+            ))
+
+    error_digest = ErrorDigest(window=error_digest_window, chat_id=admin_chat_id)
+    application.bot_data[ERROR_DIGEST] = error_digest
     application.add_error_handler(error_handler)
+    application.job_queue.run_repeating(
+        send_error_digest, interval=error_digest_window, first=error_digest_window, data=error_digest
+    )
+
+    application.bot_data[QUESTION_FUNNEL] = question_funnel
+    application.job_queue.run_repeating(save_funnel, interval=60, data=question_funnel)
+    application.bot_data[RESULT_STATS] = result_stats
+    application.job_queue.run_repeating(save_result_stats, interval=60, data=result_stats)
+    application.bot_data[ANSWER_LOG] = answer_log
+    application.bot_data[EARLY_FINISH] = early_finish
+    application.job_queue.run_repeating(flush_answer_log, interval=1, data=answer_log)
+    if admin_chat_id:
+        application.add_handler(CommandHandler("funnel", funnel_report, filters=filters.Chat(admin_chat_id)))
+        application.add_handler(CommandHandler("stats", stats_report, filters=filters.Chat(admin_chat_id)))
+
+    if session_secret:
+        application.bot_data[PROGRESS_CODEC] = ProgressCodec(session_secret)
+        application.add_handler(CommandHandler("start", start_stateless))
+        application.add_handler(CallbackQueryHandler(handle_stateless_choice, pattern=f"^{STATELESS_PREFIX}"))
+        application.add_handler(CallbackQueryHandler(expired_choice))
+        return application
+
+    application.bot_data[INLINE_KEYBOARD] = inline_keyboard
+    application.bot_data[ADAPTIVE_ENGINE] = adaptive
+    # Kept up to date by begin_session, end_session and the sweeper, so a scrape costs O(1).
+    active_sessions = REGISTRY.register(Gauge('quiz_active_sessions', "Users in the middle of a quiz."))
+    application.bot_data[ACTIVE_SESSIONS] = active_sessions
 
     conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
+        entry_points=[CommandHandler("start", start), CommandHandler("answers", bulk_answers)],
         states={
             QUIZ_IN_PROGRESS: [
                 CommandHandler("start", start), 
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_answer) 
+                CommandHandler("answers", bulk_answers),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_answer),
+                CallbackQueryHandler(handle_choice, pattern=r"^\d+:\d+$"),
             ],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
+        # Keyed by user alone, like user_data, so the session sweeper can end it by user id.
+        per_chat=False,
+        # Stored by SQLitePersistence next to the sessions, so a restart resumes mid-quiz.
+        name="quiz",
+        persistent=True,
     )
 
+    if session_ttl:
+        # PTB has no public way to end a conversation from outside its callbacks; popping the
+        # key from its tracked dict also deletes the persisted state on the next flush.
+        def evict(session: QuizSession) -> None:
+            question_funnel.abandon(session.question_num)
+            active_sessions.inc(-1)
+
+        sweeper = SessionSweeper(
+            ttl=session_ttl, on_evict=evict,
+            on_drop=lambda user_id: conv_handler._conversations.pop((user_id,), None),
+        )
+        application.bot_data[SESSION_SWEEPER] = sweeper
+        application.add_handler(TypeHandler(Update, touch_session), group=-1)
+        application.job_queue.run_repeating(sweep_sessions, interval=min(60, session_ttl), data=sweeper)
+
     application.add_handler(conv_handler)
-    
-    logger.info("Bot is running...")
-    application.run_polling()
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, session_lost))
+    application.add_handler(CallbackQueryHandler(expired_choice))
+    return application
+
+
+def main() -> None:
+    """Run the bot."""
+    load_dotenv()
+    token = os.getenv("TELEGRAM_TOKEN")
+    if not token:
+        logger.error("TELEGRAM_TOKEN not found! Please set it in .env file.")
+        return
+
+    adaptive = None
+    if os.getenv("QUIZ_ADAPTIVE") == "1":
+        # Only a model fitted on real answers (python adaptive.py <answer_log_dir> <model.npz>)
+        # tells questions apart; the uniform one would just ask them all in order.
+        model_path = os.getenv("ADAPTIVE_MODEL")
+        if not model_path:
+            logger.error("QUIZ_ADAPTIVE=1 needs ADAPTIVE_MODEL, a model fitted with adaptive.py.")
+            return
+        adaptive = AdaptiveEngine.load(
+            model_path,
+            threshold=float(os.getenv("ADAPTIVE_THRESHOLD", "0.95")),
+            min_questions=int(os.getenv("ADAPTIVE_MIN_QUESTIONS", "4")),
+        )
+
+    application = build_application(
+        token,
+        concurrent_updates=int(os.getenv("CONCURRENT_UPDATES", "1")),
+        base_url=os.getenv("TELEGRAM_API_URL"),
+        inline_keyboard=os.getenv("QUIZ_KEYBOARD") == "inline",
+        session_secret=os.getenv("STATELESS_SESSION_SECRET", "").encode() or None,
+        send_rate=float(os.getenv("SEND_RATE", "30")),
+        per_chat_rate=float(os.getenv("SEND_RATE_PER_CHAT", "1")),
+        error_digest_window=float(os.getenv("ERROR_DIGEST_WINDOW", "300")),
+        session_ttl=float(os.getenv("SESSION_TTL", "3600")),
+        metrics_port=int(os.getenv("METRICS_PORT", "0")) or None,
+        metrics_host=os.getenv("METRICS_HOST", "127.0.0.1"),
+        admin_chat_id=int(os.getenv("ADMIN_CHAT_ID", "0")) or None,
+        funnel_path=os.getenv("FUNNEL_PATH", "funnel.bin"),
+        stats_path=os.getenv("RESULT_STATS_PATH", "result_stats.json"),
+        answer_log_dir=os.getenv("ANSWER_LOG_DIR", "answer_log"),
+        record_updates=os.getenv("RECORD_UPDATES"),
+        early_finish=os.getenv("QUIZ_EARLY_FINISH") == "1",
+        adaptive=adaptive,
+    )
+
+    if os.getenv("WEBHOOK_PORT"):
+        logger.info("Bot is running in webhook mode...")
+        run_webhook(application)
+    else:
+        logger.info("Bot is running...")
+        application.run_polling()
 
 
 if __name__ == "__main__":
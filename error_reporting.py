@@ -0,0 +1,80 @@
+import logging
+import os
+import traceback
+
+from telegram.ext import ContextTypes
+
+from rate_limiter import PRIORITY_LOW
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than 4096 characters.
+MAX_MESSAGE_LENGTH = 4096
+# str(error) is cut to this many characters, so the header always leaves room for the traceback.
+MAX_ERROR_TEXT_LENGTH = 1000
+
+
+def fingerprint(error: BaseException) -> tuple:
+    """Identifies an error by its type and the innermost frame of its traceback."""
+    frames = traceback.extract_tb(error.__traceback__)
+    if not frames:
+        return (type(error).__qualname__, None)
+    frame = frames[-1]
+    return (type(error).__qualname__, f"{os.path.basename(frame.filename)}:{frame.lineno} in {frame.name}")
+
+
+class ErrorDigest:
+    """Counts handler exceptions per fingerprint over a window of `window` seconds.
+
+    drain() is meant to run once per window. Only the first occurrence of each fingerprint
+    keeps its traceback as a sample. Once max_fingerprints distinct errors are being
+    tracked, further new ones are only counted. send_error_digest sends the digest to
+    chat_id; without one it is drained unsent.
+    """
+
+    def __init__(self, window: float = 300, max_fingerprints: int = 50, chat_id: int = None):
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self.chat_id = chat_id
+        self._entries = {}
+        self._untracked = 0
+
+    def record(self, error: BaseException) -> None:
+        key = fingerprint(error)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] += 1
+        elif len(self._entries) < self.max_fingerprints:
+            sample = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+            message = f"{error}"
+            if len(message) > MAX_ERROR_TEXT_LENGTH:
+                message = message[:MAX_ERROR_TEXT_LENGTH - 1] + '…'
+            self._entries[key] = [1, message, sample]
+        else:
+            self._untracked += 1
+
+    def drain(self) -> list:
+        """Returns one message text per fingerprint seen since the last drain, and resets."""
+        entries, self._entries = self._entries, {}
+        untracked, self._untracked = self._untracked, 0
+
+        messages = []
+        for (error_type, location), (count, message, sample) in entries.items():
+            header = f"Bot error ×{count} in the last {self.window:.0f}s: {error_type}: {message}\nat {location}\n\n"
+            messages.append(header + sample[-(MAX_MESSAGE_LENGTH - len(header)):])
+        if untracked:
+            messages.append(f"Bot error: {untracked} more errors of other kinds in the last {self.window:.0f}s")
+        return messages
+
+
+async def send_error_digest(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback: sends the ErrorDigest in job.data to its chat_id at low priority."""
+    digest = context.job.data
+    messages = digest.drain()
+    if not digest.chat_id:
+        return
+    for text in messages:
+        try:
+            await context.bot.send_message(chat_id=digest.chat_id, text=text, rate_limit_args=PRIORITY_LOW)
+        except Exception:
+            logger.exception("Failed to send error digest to admin")
@@ -0,0 +1,84 @@
+import logging
+import os
+from array import array
+
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('reached', 'answered', 'invalid', 'abandoned')
+
+
+class QuestionFunnel:
+    """Per-question drop-off counters: one fixed-size array of 64-bit counts per stage.
+
+    reached[q] counts question q being shown, answered[q] accepted answers, invalid[q]
+    rejected ones and abandoned[q] quizzes evicted while waiting on q. Updates are a single
+    array increment; a report costs O(questions) no matter how many users there are.
+    With a path, the counts are loaded from it on creation and written back by save().
+    """
+
+    def __init__(self, total_questions: int, path: str = None):
+        self.total_questions = total_questions
+        self.path = path
+        for stage in STAGES:
+            setattr(self, stage, array('Q', bytes(8 * total_questions)))
+        self._dirty = False
+        if path and os.path.exists(path):
+            self._load()
+
+    def reach(self, q_num: int) -> None:
+        self.reached[q_num] += 1
+        self._dirty = True
+
+    def answer(self, q_num: int) -> None:
+        self.answered[q_num] += 1
+        self._dirty = True
+
+    def reject(self, q_num: int) -> None:
+        self.invalid[q_num] += 1
+        self._dirty = True
+
+    def abandon(self, q_num: int) -> None:
+        self.abandoned[q_num] += 1
+        self._dirty = True
+
+    def rows(self):
+        """Yields (question index, reached, answered, invalid, abandoned)."""
+        for q_num in range(self.total_questions):
+            yield (q_num,) + tuple(getattr(self, stage)[q_num] for stage in STAGES)
+
+    def report(self) -> str:
+        lines = ["  Q  reached answered invalid abandoned"]
+        for q_num, reached, answered, invalid, abandoned in self.rows():
+            lines.append(f"{q_num + 1:>3} {reached:>8} {answered:>8} {invalid:>7} {abandoned:>9}")
+        return '\n'.join(lines)
+
+    def _load(self) -> None:
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        size = 8 * self.total_questions
+        if len(data) != size * len(STAGES):
+            logger.warning("Ignoring %s: it was written for a different number of questions", self.path)
+            return
+        for position, stage in enumerate(STAGES):
+            setattr(self, stage, array('Q', data[position * size:(position + 1) * size]))
+
+    def save(self) -> None:
+        """Writes the counts to path if they changed since the last save; the file is replaced atomically."""
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            for stage in STAGES:
+                getattr(self, stage).tofile(f)
+        os.replace(tmp_path, self.path)
+
+
+async def save_funnel(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback: saves the QuestionFunnel in job.data."""
+    try:
+        context.job.data.save()
+    except OSError:
+        logger.exception("Failed to save the question funnel")
@@ -0,0 +1,221 @@
+import asyncio
+import bisect
+import functools
+import logging
+import time
+
+from aiohttp import web
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a fast handler to a slow Bot API round trip.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labelnames, labels) -> str:
+    if not labelnames:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(labelnames, labels)) + '}'
+
+
+class Counter:
+    """A monotonically increasing value per label combination.
+
+    Metrics are only updated from the event loop thread, so plain dict updates suffice:
+    no locks on the hot path.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        return [f"{self.name}{format_labels(self.labelnames, labels)} {value}" for labels, value in self._values.items()]
+
+
+class Gauge:
+    """A value that can go up and down, either set directly or read from `function` at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, function=None):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self._value = 0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self._value += amount
+
+    def value(self) -> float:
+        return self.function() if self.function else self._value
+
+    def render(self) -> list:
+        value = self.value()
+        return [f"{self.name} {value}"]
+
+
+class Histogram:
+    """Counts observations into fixed buckets per label combination, plus their sum and count.
+
+    Each observation is one bisect and two additions; buckets are only made cumulative
+    when rendered.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            # One count per bucket plus +Inf, then the sum of observed values.
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list:
+        lines = []
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{format_labels(self.labelnames + ('le',), labels + (bound,))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics by name; registering a name again replaces the previous metric."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS = REGISTRY.register(Histogram(
+    'quiz_handler_seconds', "Time spent in a quiz handler, including its Bot API calls.", ('handler',)
+))
+API_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'telegram_api_request_seconds', "Bot API request round trip time, excluding getUpdates.", ('method',)
+))
+ANSWERS = REGISTRY.register(Counter(
+    'quiz_answers_total', "Accepted answers by question index and the score type they count for.",
+    ('question', 'score_type'),
+))
+FUNNEL = REGISTRY.register(Counter(
+    'quiz_funnel_total', "Quiz runs reaching each stage: started, completed or cancelled.", ('stage',)
+))
+PERSISTENCE_FLUSH_SECONDS = REGISTRY.register(Histogram(
+    'persistence_flush_seconds', "Time to write one batch of staged rows to SQLite."
+))
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    'event_loop_lag_seconds', "How late the event loop woke up a sleeping monitor task."
+))
+
+
+def timed(handler_name: str):
+    """Decorates an async handler to record its duration in HANDLER_SECONDS."""
+    def decorator(callback):
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await callback(*args, **kwargs)
+            finally:
+                HANDLER_SECONDS.observe(time.perf_counter() - started, handler_name)
+        return wrapper
+    return decorator
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records every request's duration in API_REQUEST_SECONDS by Bot API method."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            API_REQUEST_SECONDS.observe(time.perf_counter() - started, url.rsplit('/', 1)[-1])
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Sleeps `interval` seconds at a time and records how much later than asked it woke up."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - started - interval))
+
+
+class MetricsServer:
+    """Serves REGISTRY on GET /metrics and runs the event loop lag monitor while started."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9100, registry: Registry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._runner = None
+        self._lag_monitor = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.registry.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+        logger.info("Metrics available at http://%s:%d/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._lag_monitor:
+            self._lag_monitor.cancel()
+            self._lag_monitor = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import pickle
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from metrics import PERSISTENCE_FLUSH_SECONDS
+from session import QuizSession
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Persists QuizSession user_data and conversation states in SQLite (WAL mode), one row per user.
+
+    The Application only hands over users touched since its previous run, and those rows
+    are written in a single transaction, so a flush costs O(active users) no matter how
+    many users the database already holds. Sessions are stored in their packed byte form,
+    and inactive ones (finished or cancelled quiz) are deleted instead of stored.
+
+    Packing a session is the only work done on the event loop; SQLite runs on a single
+    writer thread. Rows are double-buffered: while one batch is being written, newly
+    staged rows collect in the other and go out as the next transaction as soon as the
+    writer is free, so a slow disk delays persistence but never a handler.
+    """
+
+    def __init__(self, filepath: str = 'bot_data.sqlite3', update_interval: float = 60):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.filepath = filepath
+        # Only the writer thread uses the connection once the Application is running.
+        self._conn = sqlite3.connect(filepath, check_same_thread=False)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='persistence')
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (user_id INTEGER PRIMARY KEY, record BLOB NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations "
+            "(name TEXT NOT NULL, key TEXT NOT NULL, state BLOB NOT NULL, PRIMARY KEY (name, key))"
+        )
+        self._conn.commit()
+        # Rows staged by update_* calls since the writer thread last picked up a batch.
+        self._pending_users = {}
+        self._pending_conversations = {}
+        self._commit_task = None
+        self._writing = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            'backlog': len(self._pending_users) + len(self._pending_conversations),
+            'writing': self._writing,
+            'flushes': self.flushes,
+            'last_flush_ms': self.last_flush_seconds * 1000,
+            'max_flush_ms': self.max_flush_seconds * 1000,
+        }
+
+    async def get_user_data(self) -> dict[int, QuizSession]:
+        return {
+            user_id: QuizSession.from_bytes(record)
+            for user_id, record in self._conn.execute("SELECT user_id, record FROM sessions")
+        }
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        rows = self._conn.execute("SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    async def update_user_data(self, user_id: int, data: QuizSession) -> None:
+        self._pending_users[user_id] = data.to_bytes() if data.active else None
+        self._schedule_commit()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._pending_users[user_id] = None
+        self._schedule_commit()
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        state = None if new_state is None else pickle.dumps(new_state, pickle.HIGHEST_PROTOCOL)
+        self._pending_conversations[(name, json.dumps(list(key)))] = state
+        self._schedule_commit()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: QuizSession) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Writes anything still staged and folds the WAL back into the main database file."""
+        if self._commit_task is not None:
+            await self._commit_task
+        await self._commit_pending()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close)
+        self._executor.shutdown()
+
+    def _schedule_commit(self) -> None:
+        # update_persistence gathers one update_* call per touched user; deferring the commit
+        # by one loop iteration lets all of them land in a single transaction. While a batch
+        # is being written, the running task picks up whatever was staged meanwhile.
+        if self._commit_task is None:
+            self._commit_task = asyncio.get_running_loop().create_task(self._commit_soon())
+
+    async def _commit_soon(self) -> None:
+        await asyncio.sleep(0)
+        try:
+            while self._pending_users or self._pending_conversations:
+                await self._commit_pending()
+        except Exception:
+            logger.exception("Failed to persist %d staged rows", self.stats()['backlog'])
+        finally:
+            self._commit_task = None
+
+    async def _commit_pending(self) -> None:
+        if not self._pending_users and not self._pending_conversations:
+            return
+        users, self._pending_users = self._pending_users, {}
+        conversations, self._pending_conversations = self._pending_conversations, {}
+        self._writing = len(users) + len(conversations)
+        started = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, users, conversations)
+        except Exception:
+            # Put the batch back, behind anything staged for the same keys since, for the next attempt.
+            self._pending_users = {**users, **self._pending_users}
+            self._pending_conversations = {**conversations, **self._pending_conversations}
+            raise
+        finally:
+            self._writing = 0
+        self.last_flush_seconds = time.perf_counter() - started
+        PERSISTENCE_FLUSH_SECONDS.observe(self.last_flush_seconds)
+        self.max_flush_seconds = max(self.max_flush_seconds, self.last_flush_seconds)
+        self.flushes += 1
+
+    def _close(self) -> None:
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._conn.close()
+
+    def _write(self, users: dict, conversations: dict) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sessions (user_id, record) VALUES (?, ?)",
+                [(user_id, record) for user_id, record in users.items() if record is not None],
+            )
+            self._conn.executemany(
+                "DELETE FROM sessions WHERE user_id = ?",
+                [(user_id,) for user_id, record in users.items() if record is None],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                [(name, key, state) for (name, key), state in conversations.items() if state is not None],
+            )
+            self._conn.executemany(
+                "DELETE FROM conversations WHERE name = ? AND key = ?",
+                [(name, key) for (name, key), state in conversations.items() if state is None],
+            )
+        logger.debug("Persisted %d users and %d conversation states", len(users), len(conversations))
@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'script.json')
+
+RESULT_KEYS = ('MIXED', 'POLY', 'NEUTRAL')
+
+# Cyrillic capitals that look identical to Latin ones on a phone keyboard.
+CYRILLIC_LOOKALIKES = {"A": "А", "B": "В", "C": "С", "E": "Е", "H": "Н", "K": "К", "M": "М", "O": "О", "P": "Р", "T": "Т", "X": "Х"}
+
+
+class QuizData(NamedTuple):
+    """The parsed, validated and frozen contents of script.json plus structures derived from it."""
+    questions: tuple
+    total_questions: int
+    type_names: Mapping[str, str]
+    score_types: tuple
+    interpretations: Mapping[str, Mapping[str, str]]
+    answer_index: tuple
+    option_types: tuple
+    option_weights: tuple
+
+    @property
+    def weighted(self) -> bool:
+        """True when some option scores anything other than one point for a single type."""
+        return any(
+            len(weights) != 1 or weights[0][1] != 1
+            for question_weights in self.option_weights for weights in question_weights
+        )
+
+
+def freeze(value):
+    """Recursively turns dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def build_answer_index(questions):
+    """Maps every accepted spelling of an answer key to its option's position in the question,
+    one frozen dict per question.
+
+    Lower case and Cyrillic look-alike letters are stored as aliases, so a stripped
+    message text validates with a single lookup; option_types then gives the score type.
+    """
+    index = []
+    for question_data in questions:
+        answers = {}
+        for o_num, option in enumerate(question_data['options']):
+            key = option['key']
+            spellings = {key, key.upper(), key.lower()}
+            lookalike = CYRILLIC_LOOKALIKES.get(key.upper())
+            if lookalike:
+                spellings.update((lookalike, lookalike.lower()))
+            for spelling in spellings:
+                answers[spelling] = o_num
+        index.append(MappingProxyType(answers))
+    return tuple(index)
+
+
+def option_weights(option, score_types) -> tuple:
+    """Returns an option's ((type index, weight), ...) pairs: its "weights" mapping, e.g.
+    {"C": 0.7, "S": 0.3}, or one point for its "score_type".
+    """
+    weights = option.get('weights') or {option['score_type']: 1}
+    return tuple((score_types.index(score_type), weight) for score_type, weight in weights.items())
+
+
+def validate_quiz_data(data) -> Optional[str]:
+    """Returns a description of the first problem found in raw script.json data, or None."""
+    required_keys = {'questions', 'total_questions', 'interpretations', 'type_names'}
+    if not required_keys.issubset(data.keys()):
+        return f"missing keys: {required_keys - set(data.keys())}"
+    if not isinstance(data['questions'], list):
+        return "'questions' must be a list"
+    if data['total_questions'] != len(data['questions']):
+        return f"total_questions is {data['total_questions']} but {len(data['questions'])} questions are defined"
+    missing_results = (set(data['type_names']) | set(RESULT_KEYS)) - set(data['interpretations'])
+    if missing_results:
+        return f"interpretations missing for: {missing_results}"
+    for q_num, question_data in enumerate(data['questions'], start=1):
+        if not question_data.get('options'):
+            return f"question {q_num} has no options"
+        for option in question_data['options']:
+            weights = option.get('weights')
+            if weights is None and option.get('score_type') not in data['type_names']:
+                return f"question {q_num} option {option.get('key')} has unknown score_type {option.get('score_type')!r}"
+            if weights is None:
+                continue
+            if not isinstance(weights, dict) or not weights:
+                return f"question {q_num} option {option.get('key')}: 'weights' must be a non-empty object"
+            for score_type, weight in weights.items():
+                if score_type not in data['type_names']:
+                    return f"question {q_num} option {option.get('key')} has unknown score type {score_type!r} in weights"
+                if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+                    return f"question {q_num} option {option.get('key')} has a non-positive weight for {score_type!r}"
+    return None
+
+
+def load_quiz_data(path: str = DATA_PATH) -> Optional[QuizData]:
+    """Parses and validates script.json once; returns None (after logging why) if it is unusable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        logger.error("script.json not found.")
+        return None
+
+    problem = validate_quiz_data(data)
+    if problem:
+        logger.error("script.json: %s", problem)
+        return None
+
+    questions = freeze(data['questions'])
+    score_types = tuple(data['type_names'])
+    weights = tuple(
+        tuple(option_weights(option, score_types) for option in question_data['options'])
+        for question_data in questions
+    )
+    return QuizData(
+        questions=questions,
+        total_questions=data['total_questions'],
+        type_names=freeze(data['type_names']),
+        score_types=score_types,
+        interpretations=freeze(data['interpretations']),
+        answer_index=build_answer_index(questions),
+        # An option's type for counters and answer statistics: its heaviest weight's, the first on a tie.
+        option_types=tuple(
+            tuple(max(pairs, key=lambda pair: pair[1])[0] for pairs in question_weights)
+            for question_weights in weights
+        ),
+        option_weights=weights,
+    )
+
+
+QUIZ = load_quiz_data()
+if QUIZ is None:
+    raise SystemExit(1)
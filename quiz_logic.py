@@ -1,51 +1,154 @@
-import json
-import os
+import heapq
+import math
 
-DATA_PATH = os.path.join(os.path.dirname(__file__), 'script.json')
+from quiz_data import QUIZ
 
-try:
-    with open(DATA_PATH, 'r', encoding='utf-8') as f:
-        QUIZ_DATA = json.load(f)
-except FileNotFoundError:
-    raise FileNotFoundError("'script.json' not found; ensure it is in the same directory as quiz_logic.py.")
+# Above this many reachable counters vectors the lookup tables below are not built;
+# such quizzes, and weighted ones, are scored with scoring.WeightedScorer instead.
+MAX_TABLE_VECTORS = 1_000_000
 
-interpretations = QUIZ_DATA['interpretations']
-type_names = QUIZ_DATA['type_names']
 
-def calculate_result(scores):
+def classify(scores):
+    """Returns (result_key, dominant_type, second_type): result_key is the interpretations key.
+
+    Only the top three scores matter, so they are picked with heapq.nlargest, which keeps
+    the order of a stable full sort at O(K) for any number of types K.
+    """
+    top_scores = heapq.nlargest(3, scores.items(), key=lambda item: item[1])
+
+    max_score = top_scores[0][1]
+    dominant_type = top_scores[0][0]
+    second_type = top_scores[1][0]
+
+    if min(scores.values()) == max_score:
+        return "NEUTRAL", dominant_type, second_type
+    if len(top_scores) == 3 and top_scores[0][1] == top_scores[1][1] == top_scores[2][1]:
+        return "POLY", dominant_type, second_type
+    if (max_score - top_scores[1][1]) <= 2:
+        return "MIXED", dominant_type, second_type
+    return dominant_type, dominant_type, second_type
+
+
+def calculate_result(scores, quiz=QUIZ):
     """Calculate the final result and return (title, text)."""
-    sorted_scores = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    interpretations = quiz.interpretations
+    type_names = quiz.type_names
+    result_key, dominant_type, second_type = classify(scores)
 
-    max_score = sorted_scores[0][1]
+    if result_key == "MIXED":
+        dominant_name = type_names[dominant_type]
+        second_name = type_names[second_type]
 
-    if all(s == max_score for _, s in sorted_scores):
-        result_key = "NEUTRAL"
-        result_title = interpretations[result_key]["title"]
-        interpretation_text = interpretations[result_key]["text"]
+        title_template = interpretations[result_key]["title_template"]
+        result_title = title_template.format(Dominant_Type=dominant_name, Secondary_Type=second_name)
 
-    elif sorted_scores[0][1] == sorted_scores[1][1] == sorted_scores[2][1]:
-        result_key = "POLY"
+    else:
         result_title = interpretations[result_key]["title"]
-        interpretation_text = interpretations[result_key]["text"]
+    interpretation_text = interpretations[result_key]["text"]
+
+    return result_title, interpretation_text
+
+
+def score_vectors(total, type_count):
+    """Yields every tuple of type_count non-negative counters whose sum is at most total."""
+    if type_count == 1:
+        for count in range(total + 1):
+            yield (count,)
+        return
+    for count in range(total + 1):
+        for rest in score_vectors(total - count, type_count - 1):
+            yield (count,) + rest
+
+
+def build_result_table(quiz=QUIZ):
+    """Precomputes calculate_result for every reachable score vector, keyed by its counters as bytes."""
+    table = {}
+    results = {}
+    for counts in score_vectors(quiz.total_questions, len(quiz.score_types)):
+        result = calculate_result(dict(zip(quiz.score_types, counts)), quiz)
+        # Many vectors share a result; keep one copy of each formatted MIXED title.
+        table[bytes(counts)] = results.setdefault(result, result)
+    return table
+
+
+def build_result_key_table(quiz=QUIZ):
+    """Like build_result_table, but maps every score vector to its interpretations key."""
+    return {
+        bytes(counts): classify(dict(zip(quiz.score_types, counts)))[0]
+        for counts in score_vectors(quiz.total_questions, len(quiz.score_types))
+    }
+
+
+def build_settled_table(quiz=QUIZ, result_table=None):
+    """Maps the counters of every run whose result is already fixed to a final score vector with that result.
+
+    Questions are asked in order, so counters adding up to n mean questions 0..n-1 are
+    answered. Working back from the last question, a run is settled when every option of
+    the next question leads to a settled run with the same result; complete runs map to
+    themselves. Runs the remaining questions can still change are left out.
+    """
+    result_table = result_table or build_result_table(quiz)
+    outcomes = {}
+
+    def settle(counts):
+        key = bytes(counts)
+        if key not in outcomes:
+            answered = sum(counts)
+            if answered == quiz.total_questions:
+                outcomes[key] = key
+            else:
+                # Every child is settled first, even once this run is known to be open, so
+                # that the child's own settled descendants reach the table too.
+                child_outcomes = []
+                for type_index in set(quiz.option_types[answered]):
+                    child = bytearray(counts)
+                    child[type_index] += 1
+                    child_outcomes.append(settle(child))
+                settled = None not in child_outcomes and len({result_table[outcome] for outcome in child_outcomes}) == 1
+                outcomes[key] = child_outcomes[0] if settled else None
+        return outcomes[key]
+
+    settle(bytes(len(quiz.score_types)))
+    return {key: outcome for key, outcome in outcomes.items() if outcome is not None}
+
+
+def tables_supported(quiz=QUIZ) -> bool:
+    """True when results can be precomputed per counters vector: one point per answer and few enough vectors."""
+    type_count = len(quiz.score_types)
+    return not quiz.weighted and math.comb(quiz.total_questions + type_count, type_count) <= MAX_TABLE_VECTORS
+
+
+def _tables_for(quiz):
+    global _result_table, _result_key_table, _settled_table, _result_table_quiz
+    if _result_table_quiz is not quiz:
+        _result_table = build_result_table(quiz)
+        _result_key_table = build_result_key_table(quiz)
+        _settled_table = build_settled_table(quiz, _result_table)
+        _result_table_quiz = quiz
+    return _result_table, _result_key_table, _settled_table
+
+
+def lookup_result(counts, quiz=QUIZ):
+    """Returns (title, text) for a session's counters with a single dict lookup.
+
+    The table for QUIZ is built at import and rebuilt whenever a different QuizData is passed;
+    QuizData is immutable, so changed questions or interpretations always arrive as a new one.
+    """
+    return _tables_for(quiz)[0][bytes(counts)]
 
-    else:
-        dominant_type = sorted_scores[0][0]
-        second_type = sorted_scores[1][0]
-        second_score = sorted_scores[1][1]
 
-        if (max_score - second_score) <= 2:
-            result_key = "MIXED"
-            dominant_name = type_names[dominant_type]
-            second_name = type_names[second_type]
+def lookup_result_key(counts, quiz=QUIZ) -> str:
+    """Returns the interpretations key (a score type, MIXED, POLY or NEUTRAL) for a session's counters."""
+    return _tables_for(quiz)[1][bytes(counts)]
 
-            title_template = interpretations[result_key]["title_template"]
-            result_title = title_template.format(Dominant_Type=dominant_name, Secondary_Type=second_name)
 
-            interpretation_text = interpretations[result_key]["text"]
+def settled_counts(counts, quiz=QUIZ):
+    """Returns a final score vector whose result every completion of counts shares, or None
+    while the remaining questions can still change the result. Complete runs return themselves.
+    """
+    return _tables_for(quiz)[2].get(bytes(counts))
 
-        else:
-            result_key = dominant_type
-            result_title = interpretations[dominant_type]["title"]
-            interpretation_text = interpretations[result_key]["text"]
 
-    return result_title, interpretation_text
\ No newline at end of file
+_result_table = _result_key_table = _settled_table = _result_table_quiz = None
+if tables_supported(QUIZ):
+    _tables_for(QUIZ)
@@ -0,0 +1,177 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# rate_limit_args values; lower numbers are sent first.
+PRIORITY_RESULT = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_LOW = 2
+
+# Idle per-chat buckets are dropped after this many seconds.
+CHAT_BUCKET_IDLE = 60
+
+
+class TokenBucket:
+    """Virtual-scheduling token bucket: reserve() always takes a token and says how long to wait for it."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'stamp')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available, without taking it."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self, now: float) -> float:
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class PriorityRateLimiter(BaseRateLimiter[int]):
+    """Central scheduler for outgoing Bot API requests.
+
+    Requests addressed to a chat first wait for that chat's token bucket (per_chat_rate
+    messages/s, bursts of per_chat_burst), then queue for the global bucket (global_rate
+    messages/s). The global queue is a priority heap fed by a single dispatcher task, so
+    result messages (PRIORITY_RESULT) overtake questions, and admin notifications
+    (PRIORITY_LOW) go last. A RetryAfter pauses the dispatcher for the requested time and
+    re-queues the request, up to max_retries times. A rate of 0 disables that bucket.
+    """
+
+    def __init__(self, global_rate: float = 30, per_chat_rate: float = 1, per_chat_burst: float = 3,
+                 max_retries: int = 3):
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self._global_bucket = None
+        self._chat_buckets = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+        self._paused_until = 0.0
+        self._last_purge = 0.0
+        self.waiting_for_chat = 0
+        self.retry_after_hits = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting for the global budget."""
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        return {
+            'queue_depth': self.queue_depth,
+            'waiting_for_chat': self.waiting_for_chat,
+            'chat_buckets': len(self._chat_buckets),
+            'retry_after_hits': self.retry_after_hits,
+        }
+
+    async def initialize(self) -> None:
+        now = asyncio.get_running_loop().time()
+        if self.global_rate:
+            self._global_bucket = TokenBucket(self.global_rate, self.global_rate, now)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for _, _, future in self._queue:
+            future.cancel()
+        self._queue.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        priority = PRIORITY_DEFAULT if rate_limit_args is None else rate_limit_args
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None:
+                await self._wait_for_chat(chat_id, loop.time())
+                await self._wait_for_global(priority)
+            elif self._paused_until > loop.time():
+                await asyncio.sleep(self._paused_until - loop.time())
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                if attempt == self.max_retries:
+                    raise
+                delay = exc.retry_after
+                if isinstance(delay, datetime.timedelta):
+                    delay = delay.total_seconds()
+                self.retry_after_hits += 1
+                self._paused_until = max(self._paused_until, loop.time() + delay + 0.1)
+                logger.info("%s hit RetryAfter(%ss), re-queueing (attempt %d)", endpoint, delay, attempt + 1)
+
+    async def _wait_for_chat(self, chat_id, now: float) -> None:
+        if not self.per_chat_rate:
+            return
+        if now - self._last_purge > CHAT_BUCKET_IDLE:
+            self._purge_chat_buckets(now)
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst, now)
+        delay = bucket.reserve(now)
+        if delay:
+            self.waiting_for_chat += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.waiting_for_chat -= 1
+
+    async def _wait_for_global(self, priority: int) -> None:
+        if not self._global_bucket and self._paused_until <= asyncio.get_running_loop().time():
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+        self._wakeup.set()
+        await future
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = loop.time()
+            delay = self._paused_until - now
+            if self._global_bucket:
+                delay = max(delay, self._global_bucket.wait_time(now))
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            if self._global_bucket:
+                self._global_bucket.reserve(now)
+            future.set_result(None)
+
+    def _purge_chat_buckets(self, now: float) -> None:
+        self._last_purge = now
+        idle = [chat_id for chat_id, bucket in self._chat_buckets.items() if now - bucket.stamp > CHAT_BUCKET_IDLE]
+        for chat_id in idle:
+            del self._chat_buckets[chat_id]
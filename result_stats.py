@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import time
+
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+
+class RingCounter:
+    """Per-key counts in `slots` consecutive time buckets of `slot_seconds` each.
+
+    A bucket remembers which time slot it holds and is zeroed when that slot comes round
+    again, so recording is O(1) and summing a window is O(slots × keys).
+    """
+
+    def __init__(self, slots: int, slot_seconds: int, width: int):
+        self.slots = slots
+        self.slot_seconds = slot_seconds
+        self.width = width
+        self.epochs = [-1] * slots
+        self.counts = [[0] * width for _ in range(slots)]
+
+    def add(self, index: int, now: float) -> None:
+        slot = int(now // self.slot_seconds)
+        position = slot % self.slots
+        if self.epochs[position] != slot:
+            self.epochs[position] = slot
+            self.counts[position] = [0] * self.width
+        self.counts[position][index] += 1
+
+    def totals(self, now: float, span: int = None) -> list:
+        """Sums the last `span` slots (all of them by default), including the current one."""
+        current = int(now // self.slot_seconds)
+        oldest = current - (span or self.slots)
+        totals = [0] * self.width
+        for epoch, counts in zip(self.epochs, self.counts):
+            if oldest < epoch <= current:
+                totals = [total + count for total, count in zip(totals, counts)]
+        return totals
+
+
+class ResultStats:
+    """How many quizzes ended in each interpretations key, overall and over rolling windows.
+
+    record() is O(1): one overall counter plus one minute bucket (last hour) and one hour
+    bucket (last day and week). With a path the counters survive restarts via save().
+    """
+
+    WINDOWS = (('hour', 'minutes', 60), ('day', 'hours', 24), ('week', 'hours', 168))
+
+    def __init__(self, keys, path: str = None):
+        self.keys = tuple(keys)
+        self.path = path
+        self._positions = {key: position for position, key in enumerate(self.keys)}
+        self.totals = [0] * len(self.keys)
+        self.minutes = RingCounter(60, 60, len(self.keys))
+        self.hours = RingCounter(168, 3600, len(self.keys))
+        self._dirty = False
+        if path and os.path.exists(path):
+            self._load()
+
+    def record(self, key: str, now: float = None) -> None:
+        now = time.time() if now is None else now
+        position = self._positions[key]
+        self.totals[position] += 1
+        self.minutes.add(position, now)
+        self.hours.add(position, now)
+        self._dirty = True
+
+    def snapshot(self, now: float = None) -> dict:
+        """Returns {window: {key: count}} for 'total' and every rolling window."""
+        now = time.time() if now is None else now
+        snapshot = {'total': dict(zip(self.keys, self.totals))}
+        for window, ring, span in self.WINDOWS:
+            snapshot[window] = dict(zip(self.keys, getattr(self, ring).totals(now, span)))
+        return snapshot
+
+    def _load(self) -> None:
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        if tuple(data['keys']) != self.keys:
+            logger.warning("Ignoring %s: it was written for different result keys", self.path)
+            return
+        self.totals = data['totals']
+        for ring in ('minutes', 'hours'):
+            getattr(self, ring).epochs = data[ring]['epochs']
+            getattr(self, ring).counts = data[ring]['counts']
+
+    def save(self) -> None:
+        """Writes the counters to path if they changed since the last save; the file is replaced atomically."""
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        data = {'keys': self.keys, 'totals': self.totals}
+        for ring in ('minutes', 'hours'):
+            data[ring] = {'epochs': getattr(self, ring).epochs, 'counts': getattr(self, ring).counts}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+async def save_result_stats(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback: saves the ResultStats in job.data."""
+    try:
+        context.job.data.save()
+    except OSError:
+        logger.exception("Failed to save result statistics")
@@ -0,0 +1,54 @@
+import numpy as np
+
+from quiz_data import QUIZ
+from quiz_logic import calculate_result, classify
+
+# Scores are rounded to this many decimals before classifying, so that 0.7 + 0.3 ties with 1.
+SCORE_DECIMALS = 9
+
+
+def build_weight_matrix(quiz=QUIZ) -> np.ndarray:
+    """Compiles every option's weights into a (questions × options × types) matrix; missing options are all zero."""
+    width = max(len(question_weights) for question_weights in quiz.option_weights)
+    weights = np.zeros((quiz.total_questions, width, len(quiz.score_types)))
+    for q_num, question_weights in enumerate(quiz.option_weights):
+        for o_num, pairs in enumerate(question_weights):
+            for type_index, weight in pairs:
+                weights[q_num, o_num, type_index] += weight
+    return weights
+
+
+class WeightedScorer:
+    """Scores quizzes whose options may add fractional points to several types, e.g. 0.7 C + 0.3 S.
+
+    The options are compiled into one weight matrix when the scorer is built, so a run's
+    scores are the sum of one matrix row per answer, and a whole batch of answer sheets is
+    a single gather and sum. Results come from quiz_logic.calculate_result, which selects
+    only the top three types and so handles any number of them. The bot uses this instead
+    of the per-counters lookup tables when quiz_logic.tables_supported() is False.
+    """
+
+    def __init__(self, quiz=QUIZ):
+        self.quiz = quiz
+        self.weights = build_weight_matrix(quiz)
+
+    def score_answers(self, answers) -> np.ndarray:
+        """Scores per-question answer bytes: 0 for unanswered, otherwise option + 1 (QuizSession.answers)."""
+        picked = np.frombuffer(bytes(answers), dtype=np.uint8)
+        answered = np.flatnonzero(picked)
+        return self.weights[answered, picked[answered] - 1].sum(axis=0)
+
+    def score_sheets(self, sheets: np.ndarray) -> np.ndarray:
+        """Turns an N × total_questions matrix of option indices into N × K scores."""
+        sheets = np.asarray(sheets)
+        return self.weights[np.arange(sheets.shape[1]), sheets].sum(axis=1)
+
+    def by_type(self, scores: np.ndarray) -> dict:
+        """Returns the scores keyed by score type, rounded to SCORE_DECIMALS."""
+        return dict(zip(self.quiz.score_types, np.round(scores, SCORE_DECIMALS).tolist()))
+
+    def result(self, scores: np.ndarray):
+        """Returns (result_key, title, text) for a score vector."""
+        scores = self.by_type(scores)
+        result_key, _, _ = classify(scores)
+        return (result_key, *calculate_result(scores, self.quiz))
@@ -0,0 +1,53 @@
+class QuizSession:
+    """A user's quiz progress: the current question index plus one small counter per score type.
+
+    Used as the Application's ``user_data`` type, so every user costs one slotted object
+    instead of nested dicts. It persists as the question index, the number of counters,
+    the counters, ``answers`` if kept, and ``touched``: the Unix time of the user's last
+    update as a 4-byte integer. ``answers`` holds one byte per question, 0 while it is
+    unanswered and option + 1 after; it is only kept when questions are asked out of order.
+    """
+
+    __slots__ = ('question_num', 'counts', 'answers', 'touched')
+
+    def __init__(self):
+        self.question_num = None
+        self.counts = None
+        self.answers = None
+        self.touched = 0
+
+    @property
+    def active(self) -> bool:
+        return self.question_num is not None
+
+    def begin(self, type_count: int, question_count: int = None) -> None:
+        """Starts a fresh run with all counters at zero; question_count also keeps the answers."""
+        self.question_num = 0
+        self.counts = bytearray(type_count)
+        self.answers = bytearray(question_count) if question_count else None
+
+    def clear(self) -> None:
+        """Drops the run's state; the session stays allocated but is no longer persisted."""
+        self.question_num = None
+        self.counts = None
+        self.answers = None
+
+    def to_bytes(self) -> bytes:
+        return (bytes((self.question_num, len(self.counts))) + self.counts + (self.answers or b'')
+                + self.touched.to_bytes(4, 'big'))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "QuizSession":
+        session = cls()
+        session.question_num = data[0]
+        session.counts = bytearray(data[2:2 + data[1]])
+        session.answers = bytearray(data[2 + data[1]:-4]) or None
+        session.touched = int.from_bytes(data[-4:], 'big')
+        return session
+
+    def __deepcopy__(self, memo) -> "QuizSession":
+        if self.active:
+            return QuizSession.from_bytes(self.to_bytes())
+        session = QuizSession()
+        session.touched = self.touched
+        return session
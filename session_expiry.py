@@ -0,0 +1,84 @@
+import logging
+import time
+from collections import OrderedDict
+
+from telegram.ext import Application, ContextTypes
+
+logger = logging.getLogger(__name__)
+
+
+class SessionSweeper:
+    """Evicts the user_data of users who have not sent an update for `ttl` seconds.
+
+    touch() stamps the session and moves the user to the end of an insertion-ordered
+    index, so the least recently active users are always at its front and a sweep only
+    looks at the users it evicts. Each sweep drops at most batch_size sessions; the rest
+    wait for the next run. Sessions restored from persistence are indexed by their
+    stored timestamp on the first sweep. on_evict, if given, is called with every evicted
+    session that was still in the middle of a quiz, and on_drop with every evicted user id,
+    so that state kept outside user_data (such as the conversation) goes with it.
+    """
+
+    def __init__(self, ttl: float = 3600, batch_size: int = 1000, on_evict=None, on_drop=None):
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.on_evict = on_evict
+        self.on_drop = on_drop
+        self._last_seen = OrderedDict()
+        self._seeded = False
+        self.last_evicted = 0
+        self.evicted_total = 0
+
+    def stats(self) -> dict:
+        return {
+            'tracked': len(self._last_seen),
+            'last_evicted': self.last_evicted,
+            'evicted_total': self.evicted_total,
+        }
+
+    def touch(self, user_id: int, session, now: int = None) -> None:
+        now = int(time.time()) if now is None else now
+        session.touched = now
+        self._last_seen[user_id] = now
+        self._last_seen.move_to_end(user_id)
+
+    def _seed(self, user_data) -> None:
+        restored = sorted(
+            (session.touched, user_id) for user_id, session in user_data.items() if user_id not in self._last_seen
+        )
+        seen = OrderedDict((user_id, touched) for touched, user_id in restored)
+        seen.update(self._last_seen)
+        self._last_seen = seen
+        self._seeded = True
+
+    def sweep(self, application: Application, now: int = None) -> int:
+        """Drops up to batch_size expired sessions and returns how many were dropped."""
+        if not self._seeded:
+            self._seed(application.user_data)
+        now = int(time.time()) if now is None else now
+        cutoff = now - self.ttl
+        evicted = 0
+        while self._last_seen and evicted < self.batch_size:
+            user_id, touched = next(iter(self._last_seen.items()))
+            if touched > cutoff:
+                break
+            del self._last_seen[user_id]
+            session = application.user_data.get(user_id)
+            if self.on_evict and session is not None and session.active:
+                self.on_evict(session)
+            application.drop_user_data(user_id)
+            if self.on_drop:
+                self.on_drop(user_id)
+            evicted += 1
+        self.last_evicted = evicted
+        self.evicted_total += evicted
+        return evicted
+
+
+async def sweep_sessions(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback: runs the SessionSweeper in job.data and logs what it evicted."""
+    sweeper = context.job.data
+    evicted = sweeper.sweep(context.application)
+    if evicted:
+        logger.info("Evicted %d sessions idle for over %ss, %d still tracked",
+                    evicted, sweeper.ttl, sweeper.stats()['tracked'])
@@ -0,0 +1,75 @@
+import base64
+import hashlib
+import hmac
+import struct
+
+from quiz_data import QUIZ
+
+PREFIX = 's'
+MAC_SIZE = 8
+# Telegram limits callback_data to 64 bytes.
+MAX_CALLBACK_DATA = 64
+
+
+class ProgressCodec:
+    """Packs a user's answers so far into signed, self-contained inline button callback_data.
+
+    Layout before base64url: one byte with the number of answers, every answer's option
+    index in `bits_per_answer` bits (2 bits for up to 4 options, 4 bytes for 16 questions),
+    then a truncated HMAC-SHA256 over the user id and those bytes. A button can therefore
+    only be replayed by the user it was sent to, and nothing needs to be stored server-side.
+    """
+
+    def __init__(self, secret: bytes, quiz=QUIZ):
+        self.secret = secret
+        self.quiz = quiz
+        widest = max(len(question_data['options']) for question_data in quiz.questions)
+        self.bits_per_answer = max(1, (widest - 1).bit_length())
+        self.answer_bytes = (quiz.total_questions * self.bits_per_answer + 7) // 8
+        encoded_size = len(PREFIX) + len(self._b64(bytes(1 + self.answer_bytes + MAC_SIZE)))
+        if encoded_size > MAX_CALLBACK_DATA:
+            raise ValueError(f"quiz too large for stateless sessions: {encoded_size} bytes of callback_data")
+
+    @staticmethod
+    def _b64(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+    def _mac(self, user_id: int, payload: bytes) -> bytes:
+        return hmac.new(self.secret, struct.pack('>q', user_id) + payload, hashlib.sha256).digest()[:MAC_SIZE]
+
+    def encode(self, user_id: int, answers) -> str:
+        packed = 0
+        for position, option in enumerate(answers):
+            packed |= option << (position * self.bits_per_answer)
+        payload = bytes((len(answers),)) + packed.to_bytes(self.answer_bytes, 'little')
+        return PREFIX + self._b64(payload + self._mac(user_id, payload))
+
+    def decode(self, user_id: int, data: str):
+        """Returns the list of option indices carried by data, or None if it is malformed or forged."""
+        if not data.startswith(PREFIX):
+            return None
+        encoded = data[len(PREFIX):]
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+        except ValueError:
+            return None
+        payload, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        if len(payload) != 1 + self.answer_bytes or not hmac.compare_digest(mac, self._mac(user_id, payload)):
+            return None
+
+        count = payload[0]
+        if not 0 < count <= self.quiz.total_questions:
+            return None
+        packed = int.from_bytes(payload[1:], 'little')
+        mask = (1 << self.bits_per_answer) - 1
+        answers = [(packed >> (position * self.bits_per_answer)) & mask for position in range(count)]
+        if any(option >= len(self.quiz.option_types[q_num]) for q_num, option in enumerate(answers)):
+            return None
+        return answers
+
+    def counts(self, answers) -> bytearray:
+        """Rebuilds the per-type score counters from a list of option indices."""
+        counts = bytearray(len(self.quiz.score_types))
+        for q_num, option in enumerate(answers):
+            counts[self.quiz.option_types[q_num][option]] += 1
+        return counts
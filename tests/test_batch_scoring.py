@@ -0,0 +1,15 @@
+from batch_scoring import SCORE_TYPES, reachable_scores, score_batch
+from quiz_logic import calculate_result, classify
+
+
+def test_batch_matches_scalar_for_every_reachable_score():
+    vectors = reachable_scores()
+    result_keys, titles = score_batch(vectors)
+    mismatches = []
+    for row, result_key, title in zip(vectors, result_keys, titles):
+        scores = dict(zip(SCORE_TYPES, row.tolist()))
+        expected_key, _, _ = classify(scores)
+        expected_title, _ = calculate_result(scores)
+        if (result_key, title) != (expected_key, expected_title):
+            mismatches.append(row.tolist())
+    assert not mismatches, f"{len(mismatches)} of {len(vectors)} differ, e.g. {mismatches[:5]}"
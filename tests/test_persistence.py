@@ -0,0 +1,102 @@
+import asyncio
+import sqlite3
+import threading
+
+import bot
+from benchmarks.fake_bot_api import FakeBotApi, message_update
+from benchmarks.loadtest import TOKEN
+from persistence import SQLitePersistence
+from quiz_data import QUIZ
+from session import QuizSession
+
+
+def session_at(q_num: int) -> QuizSession:
+    """An in-progress session that answered the first q_num questions with their first option."""
+    session = QuizSession()
+    session.begin(len(QUIZ.score_types))
+    for answered in range(q_num):
+        session.counts[QUIZ.option_types[answered][0]] += 1
+    session.question_num = q_num
+    return session
+
+
+async def wait_for(condition) -> None:
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+async def stage_through_failed_write(path: str) -> None:
+    persistence = SQLitePersistence(filepath=path)
+    release_first, fail_second = threading.Event(), threading.Event()
+    batches = []
+    write = persistence._write
+
+    def gated_write(users, conversations):
+        batches.append(dict(users))
+        if len(batches) == 1:
+            release_first.wait(5)
+        elif len(batches) == 2:
+            fail_second.wait(5)
+            raise sqlite3.OperationalError("disk I/O error")
+        write(users, conversations)
+
+    persistence._write = gated_write
+
+    await persistence.update_user_data(1, session_at(1))
+    await persistence.update_conversation('quiz', (1,), bot.QUIZ_IN_PROGRESS)
+    await wait_for(lambda: len(batches) == 1)
+
+    # Staged while the first batch is being written: they go out as the next batch.
+    await persistence.update_user_data(1, session_at(2))
+    await persistence.update_user_data(2, session_at(1))
+    release_first.set()
+    await wait_for(lambda: len(batches) == 2)
+    assert set(batches[1]) == {1, 2}
+
+    # Staged while the second batch is in flight; that batch then fails and is put back behind it.
+    await persistence.update_user_data(1, session_at(3))
+    fail_second.set()
+    await wait_for(lambda: persistence._commit_task is None)
+    assert persistence._pending_users == {1: session_at(3).to_bytes(), 2: session_at(1).to_bytes()}
+
+    await persistence.flush()
+    assert len(batches) == 3
+
+
+def test_failed_write_keeps_newest_rows(tmp_path):
+    path = str(tmp_path / 'bot_data.sqlite3')
+    asyncio.run(stage_through_failed_write(path))
+
+    with sqlite3.connect(path) as conn:
+        records = dict(conn.execute("SELECT user_id, record FROM sessions"))
+        conversations = conn.execute("SELECT name, key FROM conversations").fetchall()
+    assert {user_id: QuizSession.from_bytes(record).question_num for user_id, record in records.items()} == {1: 3, 2: 1}
+    assert conversations == [('quiz', '[1]')]
+
+    # After a restart, user 1's next answer continues the quiz at its fifth question.
+    sent = []
+
+    async def restart() -> None:
+        api = FakeBotApi(on_send=lambda method, params, response, elapsed: sent.append(params.get('text') or ''))
+        url = await api.start()
+        application = bot.build_application(
+            TOKEN, base_url=url, persistence_path=path, funnel_path=str(tmp_path / 'funnel.bin'),
+            stats_path=str(tmp_path / 'result_stats.json'), answer_log_dir=str(tmp_path / 'answer_log'),
+            send_rate=0, per_chat_rate=0,
+        )
+        async with application:
+            await application.post_init(application)
+            await application.updater.start_polling(poll_interval=0, timeout=1)
+            await application.start()
+            api.push_update(message_update(1, 'A'))
+            await wait_for(lambda: any(text.startswith("Вопрос") for text in sent))
+            await application.updater.stop()
+            await application.stop()
+            await application.post_shutdown(application)
+        await api.stop()
+
+    asyncio.run(restart())
+    assert any(text.startswith(f"Вопрос 5 из {QUIZ.total_questions}") for text in sent), sent
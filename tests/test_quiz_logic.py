@@ -0,0 +1,30 @@
+from quiz_data import QUIZ
+from quiz_logic import build_result_table, score_vectors, settled_counts
+
+
+def completions(counts, quiz=QUIZ):
+    """Every final score vector reachable from counts by answering the remaining questions in order."""
+    finals = {bytes(counts)}
+    for types in quiz.option_types[sum(counts):]:
+        finals = {final[:t] + bytes((final[t] + 1,)) + final[t + 1:] for final in finals for t in set(types)}
+    return finals
+
+
+def test_settled_counts_matches_brute_force():
+    result_table = build_result_table(QUIZ)
+    for counts in score_vectors(QUIZ.total_questions, len(QUIZ.score_types)):
+        results = {result_table[final] for final in completions(counts)}
+        outcome = settled_counts(counts)
+        if len(results) == 1:
+            assert outcome is not None, counts
+            assert result_table[outcome] in results, counts
+        else:
+            assert outcome is None, counts
+
+
+def test_single_type_runs_finish_early():
+    for type_index in range(len(QUIZ.score_types)):
+        counts = bytearray(len(QUIZ.score_types))
+        while settled_counts(counts) is None:
+            counts[type_index] += 1
+        assert sum(counts) < QUIZ.total_questions
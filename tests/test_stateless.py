@@ -0,0 +1,60 @@
+import base64
+
+from quiz_data import QUIZ
+from stateless import PREFIX, ProgressCodec
+
+SECRET = b'test secret'
+USER_ID = 1001
+
+
+def raw(data: str) -> bytes:
+    encoded = data[len(PREFIX):]
+    return base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+
+
+def signed(codec: ProgressCodec, payload: bytes) -> str:
+    """Builds callback_data for an arbitrary payload with a valid MAC, as only the server could."""
+    return PREFIX + codec._b64(payload + codec._mac(USER_ID, payload))
+
+
+def test_round_trip():
+    codec = ProgressCodec(SECRET)
+    for answers in ([0], [3, 1, 2], [q_num % 4 for q_num in range(QUIZ.total_questions)]):
+        assert codec.decode(USER_ID, codec.encode(USER_ID, answers)) == answers
+
+
+def test_rejects_other_user():
+    codec = ProgressCodec(SECRET)
+    assert codec.decode(USER_ID + 1, codec.encode(USER_ID, [1, 2])) is None
+
+
+def test_rejects_flipped_mac_byte():
+    codec = ProgressCodec(SECRET)
+    data = bytearray(raw(codec.encode(USER_ID, [1, 2])))
+    data[-1] ^= 1
+    assert codec.decode(USER_ID, PREFIX + codec._b64(bytes(data))) is None
+
+
+def test_rejects_truncated_data():
+    codec = ProgressCodec(SECRET)
+    data = codec.encode(USER_ID, [1, 2])
+    for length in (0, len(PREFIX), len(PREFIX) + 1, len(data) // 2, len(data) - 1):
+        assert codec.decode(USER_ID, data[:length]) is None
+
+
+def test_rejects_count_beyond_total_questions():
+    codec = ProgressCodec(SECRET)
+    payload = bytes((QUIZ.total_questions + 1,)) + bytes(codec.answer_bytes)
+    assert codec.decode(USER_ID, signed(codec, payload)) is None
+
+
+def test_rejects_option_out_of_range():
+    # Every question of QUIZ has all four options, so give the first one only three.
+    first = dict(QUIZ.questions[0], options=QUIZ.questions[0]['options'][:3])
+    quiz = QUIZ._replace(
+        questions=(first,) + QUIZ.questions[1:],
+        option_types=(QUIZ.option_types[0][:3],) + QUIZ.option_types[1:],
+    )
+    codec = ProgressCodec(SECRET, quiz)
+    assert codec.decode(USER_ID, codec.encode(USER_ID, [2, 3])) == [2, 3]
+    assert codec.decode(USER_ID, codec.encode(USER_ID, [3, 3])) is None
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Updates one user may have admitted at once, counting the one being handled; more are dropped.
+MAX_QUEUED_PER_USER = 5
+
+
+class PerUserOrderedProcessor(BaseUpdateProcessor):
+    """Processes updates of different users concurrently but each user's updates strictly in order.
+
+    Every update first waits for the previous update of the same user (a FIFO lock per user,
+    dropped once nobody is queued on it), then for one of `workers` worker slots. Waiting on
+    the user lock before taking a slot means one user flooding the bot cannot occupy workers
+    that other users need. At most `max_pending` updates are admitted at once; beyond that
+    the base class holds them back. An update waiting on its user still holds one of those
+    admission slots, so once a user has `max_per_user` updates admitted, further ones are
+    dropped rather than left to fill the slots other users' updates need.
+    """
+
+    def __init__(self, workers: int, max_pending: int = None, max_per_user: int = MAX_QUEUED_PER_USER):
+        super().__init__(max_pending or workers * 10)
+        self.workers = workers
+        self.max_per_user = max_per_user
+        self._worker_slots = asyncio.Semaphore(workers)
+        self._user_locks = {}
+        self.running = 0
+        self.peak_running = 0
+        self.waiting_for_user = 0
+        self.waiting_for_worker = 0
+        self.processed = 0
+        self.dropped = 0
+
+    async def do_process_update(self, update, coroutine) -> None:
+        user = getattr(update, 'effective_user', None)
+        if user is None:
+            await self._run(coroutine)
+            return
+
+        entry = self._user_locks.get(user.id)
+        if entry is None:
+            entry = self._user_locks[user.id] = [asyncio.Lock(), 0]
+        elif entry[1] >= self.max_per_user:
+            coroutine.close()
+            self.dropped += 1
+            logger.debug("Dropped an update from user %d with %d already queued", user.id, entry[1])
+            return
+        entry[1] += 1
+        lock = entry[0]
+        try:
+            if lock.locked():
+                self.waiting_for_user += 1
+                try:
+                    await lock.acquire()
+                finally:
+                    self.waiting_for_user -= 1
+            else:
+                await lock.acquire()
+            try:
+                await self._run(coroutine)
+            finally:
+                lock.release()
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._user_locks[user.id]
+
+    async def _run(self, coroutine) -> None:
+        self.waiting_for_worker += 1
+        try:
+            await self._worker_slots.acquire()
+        finally:
+            self.waiting_for_worker -= 1
+        self.running += 1
+        self.peak_running = max(self.peak_running, self.running)
+        try:
+            await coroutine
+        finally:
+            self.running -= 1
+            self.processed += 1
+            self._worker_slots.release()
+
+    def stats(self) -> dict:
+        """Back-pressure snapshot: busy workers, updates queued behind a user or a worker, totals."""
+        return {
+            'workers': self.workers,
+            'running': self.running,
+            'peak_running': self.peak_running,
+            'waiting_for_user': self.waiting_for_user,
+            'waiting_for_worker': self.waiting_for_worker,
+            'admitted': self.current_concurrent_updates,
+            'processed': self.processed,
+            'dropped': self.dropped,
+        }
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._user_locks:
+            logger.warning("Update processor shut down with %d users still queued", len(self._user_locks))
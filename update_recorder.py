@@ -0,0 +1,74 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+# Register the recorder's handler in this group so it sees every update before any other handler.
+RECORDER_GROUP = -100
+
+
+class UpdateRecorder:
+    """Records every incoming Update as raw Bot API JSON to a gzip-compressed JSON-lines file.
+
+    Each line is {"t": <Unix time received>, "update": <Update.to_dict()>}; benchmarks/replay.py
+    feeds such a file back through the bot. Lines are buffered on the event loop and
+    compressed and written by a single writer thread on flush().
+
+    Recordings contain user ids and message texts: enable this only where that is allowed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._lines = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='update-recorder')
+        self.recorded = 0
+
+    async def record(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """TypeHandler callback; register it with group=RECORDER_GROUP."""
+        self._lines.append(json.dumps({'t': time.time(), 'update': update.to_dict()}, ensure_ascii=False))
+        self.recorded += 1
+
+    async def flush(self) -> None:
+        lines, self._lines = self._lines, []
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write, lines)
+
+    async def close(self) -> None:
+        await self.flush()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._file.close)
+        self._executor.shutdown()
+
+    def _write(self, lines: list) -> None:
+        if not lines:
+            return
+        try:
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+        except OSError:
+            logger.exception("Failed to record %d updates", len(lines))
+
+
+def read_recording(path: str):
+    """Yields (received_time, update dict) for every update in a recording, in order.
+
+    A recording cut short by a crash is read up to its last flushed line.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                entry = json.loads(line)
+                yield entry['t'], entry['update']
+        except (EOFError, json.JSONDecodeError):
+            logger.warning("%s ends with an incomplete entry; replaying what precedes it", path)
+
+
+async def flush_update_recorder(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback: writes out the UpdateRecorder in job.data."""
+    await context.job.data.flush()
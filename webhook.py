@@ -0,0 +1,131 @@
+import asyncio
+import hmac
+import logging
+import os
+import signal
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """Receives Telegram updates over HTTP and feeds them into the Application's update queue.
+
+    Requests must carry the configured secret token. Once max_pending updates are queued or
+    being processed, new ones are answered with 503 so Telegram retries them later instead
+    of the bot buffering without bound. With concurrent updates the Application turns every
+    queued update into a task at once, so the queue stays nearly empty; the update
+    processor's admitted updates are counted too, and once all of its max_concurrent_updates
+    slots are taken new updates are refused, since further tasks would wait unseen.
+    """
+
+    def __init__(self, application: Application, path: str = '/telegram', secret_token: str = None, max_pending: int = 1000):
+        if not secret_token:
+            raise ValueError("a webhook secret token is required")
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.max_pending = max_pending
+        self._runner = None
+
+    def pending(self) -> int:
+        """Updates waiting in the queue plus those admitted by the update processor."""
+        return self.application.update_queue.qsize() + self.application.update_processor.current_concurrent_updates
+
+    def is_full(self) -> bool:
+        processor = self.application.update_processor
+        if processor.max_concurrent_updates > 1 and processor.current_concurrent_updates >= processor.max_concurrent_updates:
+            return True
+        return self.pending() >= self.max_pending
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, '').encode(), self.secret_token.encode()
+        ):
+            return web.Response(status=403)
+
+        if self.is_full():
+            logger.warning("Webhook queue full (%d pending), rejecting update", self.pending())
+            return web.Response(status=503)
+
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except (ValueError, TypeError, AttributeError, KeyError):
+            # Not JSON, or JSON that is not an Update object (a list, null, missing update_id).
+            return web.Response(status=400)
+        if update is None:
+            return web.Response(status=400)
+
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def start(self, host: str, port: int) -> None:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info("Webhook server listening on %s:%d%s", host, port, self.path)
+
+    async def stop(self) -> None:
+        """Stops accepting connections; requests already being handled are allowed to finish."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve_webhook(application: Application, host: str, port: int, path: str, url: str = None,
+                        secret_token: str = None, max_pending: int = 1000) -> None:
+    """Runs the Application behind a WebhookServer until SIGINT/SIGTERM, then drains it.
+
+    If url is given the webhook is registered with Telegram; leave it empty to test
+    locally by POSTing recorded Update JSON to http://host:port/path with the secret
+    token in the X-Telegram-Bot-Api-Secret-Token header.
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    server = WebhookServer(application, path, secret_token, max_pending)
+    async with application:
+        # Same hooks, in the same places, as Application.run_polling/run_webhook.
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start(host, port)
+        if url:
+            await application.bot.set_webhook(
+                url=url.rstrip('/') + path, secret_token=secret_token, allowed_updates=Update.ALL_TYPES
+            )
+
+        await stop_event.wait()
+        logger.info("Shutting down webhook server...")
+        await server.stop()
+        # Application.stop() processes every update still queued before returning.
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+    if application.post_shutdown:
+        await application.post_shutdown(application)
+
+
+def run_webhook(application: Application) -> None:
+    """Starts webhook mode using the WEBHOOK_* environment variables; WEBHOOK_SECRET is required."""
+    if not os.getenv('WEBHOOK_SECRET'):
+        logger.error("WEBHOOK_SECRET not set! The webhook would accept updates from anyone.")
+        return
+    asyncio.run(serve_webhook(
+        application,
+        host=os.getenv('WEBHOOK_HOST', '0.0.0.0'),
+        port=int(os.getenv('WEBHOOK_PORT')),
+        path=os.getenv('WEBHOOK_PATH', '/telegram'),
+        url=os.getenv('WEBHOOK_URL'),
+        secret_token=os.getenv('WEBHOOK_SECRET'),
+        max_pending=int(os.getenv('WEBHOOK_MAX_PENDING', '1000')),
+    ))